@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+
+# Copyright: © Exathink, LLC (2011-2018) All Rights Reserved
+
+# Unauthorized use or copying of this file and its contents, via any medium
+# is strictly prohibited. The work product in this file is proprietary and
+# confidential.
+
+# Author: Krishna Kumar
+
+from collections import OrderedDict
+from threading import RLock
+
+
+class LRUCache:
+    """
+    A bounded, thread safe mapping that evicts the least recently used entry
+    once maxsize entries are held. Hits, misses and evictions are counted so that
+    cache effectiveness can be inspected at runtime via info().
+
+    The get/__setitem__ pair is also the protocol SQLAlchemy expects of a
+    compiled_cache execution option, so instances can be used there directly.
+    """
+
+    def __init__(self, maxsize=128, on_evict=None):
+        self.maxsize = maxsize
+        # called with the key and value of each evicted entry
+        self.on_evict = on_evict
+        self.entries = OrderedDict()
+        self.lock = RLock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        with self.lock:
+            try:
+                value = self.entries[key]
+            except KeyError:
+                self.misses += 1
+                return default
+
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def __setitem__(self, key, value):
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                evicted_key, evicted = self.entries.popitem(last=False)
+                self.evictions += 1
+                if self.on_evict is not None:
+                    self.on_evict(evicted_key, evicted)
+
+    def __contains__(self, key):
+        with self.lock:
+            return key in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get_or_create(self, key, factory):
+        value = self.get(key)
+        if value is None:
+            # the factory is invoked outside the lock: two threads racing on the
+            # same key may both build the value, but the results are equivalent
+            # and the last one written wins.
+            value = factory()
+            self[key] = value
+        return value
+
+    def pop(self, key, default=None):
+        with self.lock:
+            return self.entries.pop(key, default)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def info(self):
+        with self.lock:
+            return dict(
+                hits=self.hits,
+                misses=self.misses,
+                evictions=self.evictions,
+                size=len(self.entries),
+                maxsize=self.maxsize
+            )
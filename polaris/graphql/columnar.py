@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+
+# Copyright: © Exathink, LLC (2011-2018) All Rights Reserved
+
+# Unauthorized use or copying of this file and its contents, via any medium
+# is strictly prohibited. The work product in this file is proprietary and
+# confidential.
+
+# Author: Krishna Kumar
+
+from numbers import Number
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+def columnar_available():
+    return numpy is not None
+
+
+class ResultColumns:
+    """
+    Columnar view of a result set for vectorized summarization: columns['name'] is a NumPy array of
+    the values of that column. Each array is built on first access and reused thereafter, so the
+    rows are transposed at most once per column however many summarizers read it.
+
+    Numeric columns containing nulls are returned as float arrays with NaN for the nulls.
+    Other columns, including list and ARRAY columns, are returned as one dimensional arrays of the row values.
+    """
+
+    def __init__(self, rows):
+        if numpy is None:
+            raise ImportError('numpy is required for columnar result sets')
+        self.rows = rows
+        self.arrays = dict()
+
+    def __len__(self):
+        return len(self.rows)
+
+    def keys(self):
+        return self.rows[0].keys() if len(self.rows) > 0 else []
+
+    def __contains__(self, name):
+        return name in self.keys()
+
+    def __getitem__(self, name):
+        array = self.arrays.get(name)
+        if array is None:
+            array = self.arrays[name] = column_array([row[name] for row in self.rows])
+        return array
+
+
+def column_array(values):
+    if any(isinstance(value, (list, tuple)) for value in values):
+        # list and ARRAY columns are kept as one dimensional arrays of the row values. numpy.array would
+        # make a matrix of them if they were all the same length, and raises on ragged ones.
+        return object_array(values)
+
+    array = numpy.array(values)
+    if array.dtype == object and all(value is None or isinstance(value, Number) for value in values):
+        # nulls (and Decimals) leave numeric columns as object arrays, which are not vectorized.
+        array = numpy.array([numpy.nan if value is None else float(value) for value in values], dtype=float)
+    return array
+
+
+def object_array(values):
+    array = numpy.empty(len(values), dtype=object)
+    for index, value in enumerate(values):
+        array[index] = value
+    return array
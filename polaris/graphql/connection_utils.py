@@ -7,29 +7,109 @@
 # confidential.
 
 # Author: Krishna Kumar
+import asyncio
 from abc import abstractmethod, ABC
 from functools import partial
 from contextlib import contextmanager
+from datetime import datetime, date
+from decimal import Decimal
+from uuid import UUID
+import json
+from time import perf_counter
 import graphene
 from graphene.relay import Connection, ConnectionField
 from graphene.relay.connection import PageInfo
-from graphql_relay.connection.arrayconnection import connection_from_list_slice, connection_from_list
+from graphql_relay.connection.arrayconnection import connection_from_list_slice, connection_from_list, \
+    get_offset_with_default, offset_to_cursor
+from graphql_relay.utils import base64, unbase64
 from graphene.utils.subclass_with_meta import SubclassWithMeta
+from graphql.error import GraphQLError
 
-from sqlalchemy.sql import select, func, text
+from sqlalchemy.sql import select, func, text, bindparam
 
 from polaris.common import db
-from .join_utils import cte_join, collect_join_resolvers
-from .utils import is_paging, snake_case
-from .interfaces import ConnectionSummarize
+from .join_utils import cte_join_plan, collect_join_resolvers, execute_query, split_join_plan, can_split_join, \
+    resolve_split_join, select_interfaces, paging_params, planner_estimate
+from .utils import is_paging, snake_case, register_interface, GraphQLImplementationError, run_in_thread, \
+    selected_fields
+from .interfaces import ConnectionSummarize, ConnectionCountMode
+from .records import to_objects, iter_objects
+from .cache_utils import LRUCache
+from .loaders import get_connection_loader
+from .session_utils import request_session, create_session
+from .result_cache import cached_result, get_result_cache, result_cache_key, result_tags
+from .temp_tables import prepare_temp_table, analyze_temp_table, release_temp_table
+from .columnar import ResultColumns, columnar_available
+from .summarization_cost import summarization_costs, DB, SERVER, TEMP_TABLE, RESULT_SET
+from . import instrumentation
+from .instrumentation import instrument
 
 from graphene.types.objecttype import ObjectTypeOptions
 
 
+KEYSET_CURSOR_PREFIX = 'keyset:'
+
+
+def encode_keyset_value(value):
+    if isinstance(value, datetime):
+        return {'datetime': value.isoformat()}
+    elif isinstance(value, date):
+        return {'date': value.isoformat()}
+    elif isinstance(value, Decimal):
+        return {'decimal': str(value)}
+    elif isinstance(value, UUID):
+        return {'uuid': str(value)}
+    else:
+        return value
+
+
+def decode_keyset_value(value):
+    if isinstance(value, dict):
+        if 'datetime' in value:
+            return datetime.fromisoformat(value['datetime'])
+        elif 'date' in value:
+            return date.fromisoformat(value['date'])
+        elif 'decimal' in value:
+            return Decimal(value['decimal'])
+        elif 'uuid' in value:
+            return UUID(value['uuid'])
+    return value
+
+
+def keyset_cursor(values):
+    return base64(KEYSET_CURSOR_PREFIX + json.dumps([encode_keyset_value(value) for value in values]))
+
+
+def is_keyset_cursor(cursor):
+    try:
+        return unbase64(cursor).startswith(KEYSET_CURSOR_PREFIX)
+    except Exception:
+        return False
+
+
+def keyset_cursor_values(cursor):
+    return [decode_keyset_value(value) for value in json.loads(unbase64(cursor)[len(KEYSET_CURSOR_PREFIX):])]
+
+
+def checked_count_cap(count_cap):
+    if count_cap is not None and count_cap < 1:
+        raise GraphQLError(f'countCap must be at least 1, got {count_cap}')
+    return count_cap
+
+
 class ConnectionQuery(ABC):
-    def __init__(self, **kwargs):
+    # The count reported for the connection: exact counts every row, estimated reports the
+    # planner's estimate where there is one, and capped counts up to COUNT_CAP rows. Set per query
+    # via the countMode and countCap arguments of the connection field, or globally here.
+    COUNT_MODE = ConnectionCountMode.exact.value
+    COUNT_CAP = 10000
+
+    def __init__(self, countMode=None, countCap=None, **kwargs):
         self.limit = None
         self.offset = None
+        self.count_mode = countMode if countMode is not None else type(self).COUNT_MODE
+        self.count_cap = checked_count_cap(countCap) if countCap is not None else type(self).COUNT_CAP
+        self.counted = None
 
     @staticmethod
     def decode_slice(slc):
@@ -93,6 +173,41 @@ class ConnectionQuery(ABC):
     def execute(self):
         pass
 
+    def capped_count(self, limit):
+        # The count of at most limit + 1 rows. Queries that cannot stop counting at a limit count them all.
+        return self.count()
+
+    def estimated_count(self):
+        # None if there is no estimate to be had.
+        return None
+
+    def count_with_mode(self, limit=None):
+        """
+        The count reported for the connection in the count mode of the query, along with the mode
+        that produced it. The mode is exact whenever the count is, so a capped count of fewer rows
+        than the cap, or an estimate where there is none, is reported as exact. The cap is raised to limit
+        if that is greater, so that a capped count covers the page of the connection requested.
+        """
+        if self.counted is None:
+            if self.count_mode == ConnectionCountMode.capped.value:
+                limit = max(self.count_cap, limit or 0)
+                count = self.capped_count(limit)
+                if count > limit:
+                    self.counted = limit, ConnectionCountMode.capped.value
+                else:
+                    self.counted = count, ConnectionCountMode.exact.value
+            elif self.count_mode == ConnectionCountMode.estimated.value:
+                estimate = self.estimated_count()
+                if estimate is not None:
+                    self.counted = estimate, ConnectionCountMode.estimated.value
+            if self.counted is None:
+                self.counted = self.count(), ConnectionCountMode.exact.value
+        return self.counted
+
+
+# The statements for SQL text queries are kept so that the compiled form of each is reused across requests.
+text_clauses = LRUCache(maxsize=256)
+
 
 class SQLConnectionQuery(ConnectionQuery):
     def __init__(self, orm_session, sql, **kwargs):
@@ -102,25 +217,48 @@ class SQLConnectionQuery(ConnectionQuery):
         self.params = kwargs
 
     def count(self):
-        return self.session.connection().execute(self.count_query, self.params).scalar()
+        return execute_query(self.session.connection(), self.count_query, self.params, cached=True).scalar()
 
     @property
     def count_query(self):
-        return select([func.count()]).select_from(
-            text(f"({self.sql}) as ____")
+        return text_clauses.get_or_create(
+            ('count', self.sql),
+            lambda: select([func.count()]).select_from(text(f"({self.sql}) as ____"))
+        )
+
+    def capped_count(self, limit):
+        capped_count_query = text_clauses.get_or_create(
+            ('capped_count', self.sql),
+            lambda: select([func.count()]).select_from(text(f"({self.sql} LIMIT :_count_limit) as ____"))
+        )
+        return execute_query(
+            self.session.connection(), capped_count_query, {**self.params, '_count_limit': limit + 1}, cached=True
+        ).scalar()
+
+    def estimated_count(self):
+        return planner_estimate(
+            self.session.connection(),
+            text_clauses.get_or_create(self.sql, lambda: text(self.sql)),
+            self.params
         )
 
     def execute(self):
+        # LIMIT and OFFSET are bound parameters, so that every page is the same statement.
         base_query = self.sql
         if self.limit:
-            base_query = f"{base_query} LIMIT {self.limit}"
+            base_query = f"{base_query} LIMIT :_limit"
 
-        if self.offset:
-            base_query = f"{base_query} OFFSET {self.offset}"
+        if self.limit or self.offset:
+            base_query = f"{base_query} OFFSET :_offset"
 
         # this class assumes that session will be closed in the calling scope.
         # connection will be soft-closed per semantics of execute method.
-        result_proxy = self.session.connection().execute(text(base_query), self.params)
+        result_proxy = execute_query(
+            self.session.connection(),
+            text_clauses.get_or_create(base_query, lambda: text(base_query)),
+            {**self.params, **paging_params(self.limit, self.offset)},
+            cached=True
+        )
         result = result_proxy.fetchall()
         return result
 
@@ -128,7 +266,17 @@ class SQLConnectionQuery(ConnectionQuery):
 class QueryConnectionField(ConnectionField):
     DB_SUMMARIZATION_THRESHOLD = 1000
 
-    def __init__(self, type, *args, **kwargs):
+    # Async resolution returns awaitables from the field resolver, for use when the schema is executed
+    # by an asyncio executor. Blocking database work is run on the default executor of the event loop, so that
+    # sibling connections resolve concurrently. Enabled per field via the async_resolution argument
+    # or globally here.
+    ASYNC_RESOLUTION = False
+
+    def __init__(self, type, *args, query_options=None, async_resolution=None, **kwargs):
+        # query_options are applied to the ConnectionResolverQuery returned by the
+        # field resolver. They override the options set on the connection resolver.
+        self.query_options = query_options
+        self.async_resolution = async_resolution if async_resolution is not None else self.ASYNC_RESOLUTION
         kwargs.setdefault(
             'summariesOnly',
             graphene.Argument(
@@ -145,6 +293,20 @@ class QueryConnectionField(ConnectionField):
                 default_value=ConnectionSummarize.default.value
             )
         )
+        kwargs.setdefault(
+            'countMode',
+            graphene.Argument(
+                ConnectionCountMode,
+                required=False
+            )
+        )
+        kwargs.setdefault(
+            'countCap',
+            graphene.Argument(
+                graphene.Int,
+                required=False
+            )
+        )
         kwargs.setdefault(
             'referenceDate',
             graphene.Argument(
@@ -176,41 +338,182 @@ class QueryConnectionField(ConnectionField):
         for interface_name in summary_interfaces:
             summarizer = ConnectionSummarizer.get_summarizer(interface_name)
             if summarizer:
-                if hasattr(summarizer, 'summarize_db'):
+                if hasattr(summarizer, 'summarize_db') or summarizer.is_aggregate():
                     db_summarizers[interface_name] = summarizer
-                if hasattr(summarizer, 'summarize_result_set'):
+                if hasattr(summarizer, 'summarize_result_set') or summarizer.is_columnar():
                     result_set_summarizers[interface_name] = summarizer
 
         return db_summarizers, result_set_summarizers
 
     @classmethod
-    def compute_db_summaries(cls, target_summaries, db_summarizers, connection_resolver_query, return_result_set):
+    def compute_db_summaries(cls, target_summaries, db_summarizers, connection_resolver_query, return_result_set,
+                             total_data_size=None):
         summary_results = dict()
         result_set = None
-        with db.create_session() as session:
+        watermarks = dict()
+        with create_session() as session:
+            start = perf_counter()
             with connection_resolver_query.create_temp_table(session) as connection_query_temp:
+                summarization_costs.record(TEMP_TABLE, DB, total_data_size or 0, perf_counter() - start)
+                aggregate_summarizers = {
+                    summary: summarizer for summary, summarizer in db_summarizers.items()
+                    if summary in target_summaries and summarizer.is_aggregate()
+                }
+                if len(aggregate_summarizers) > 0:
+                    summary_results.update(
+                        cls.compute_aggregate_summaries(aggregate_summarizers, connection_query_temp, session,
+                                                        total_data_size, connection_resolver_query.resolver_context)
+                    )
+
                 for summary in target_summaries:
-                    if summary in db_summarizers:
+                    if summary in db_summarizers and summary not in aggregate_summarizers:
                         summarizer = db_summarizers[summary]
-                        summary_results[summary] = summarizer.summarize_db(connection_query_temp, session)
-
+                        start = perf_counter()
+                        with instrument(instrumentation.SUMMARIZE_DB, connection_resolver_query.resolver_context,
+                                        summary) as event:
+                            summary_results[summary] = summarizer.summarize_db(connection_query_temp, session)
+                            event.rows = total_data_size
+                        summarization_costs.record(summary, DB, total_data_size or 0, perf_counter() - start)
+
+                watermarks = cls.temp_table_watermarks(summary_results, connection_query_temp, session)
                 if len(summary_results) < len(target_summaries) or return_result_set:
                     result_set = connection_resolver_query.execute(join_session=session, to_object=False)
 
-        return summary_results, result_set
+        return summary_results, result_set, watermarks
 
     @classmethod
-    def compute_result_set_summaries(cls, target_summaries, result_set_summarizers, result_set, summary_result=None):
+    def compute_aggregate_summaries(cls, aggregate_summarizers, connection_query_temp, session, total_data_size=None,
+                                    resolver_context=None):
+        # The aggregates of all the summarizers are computed in a single scan of the temp table. Each
+        # aggregate is labelled with its summary so that the values can be fanned back out to the summarizers.
+        columns = []
+        for summary, summarizer in aggregate_summarizers.items():
+            for name, aggregate in summarizer.summary_aggregates(connection_query_temp).items():
+                columns.append(aggregate.label(f'{summary}__{name}'))
+
+        statement = select(columns).select_from(connection_query_temp)
+        start = perf_counter()
+        with instrument(instrumentation.SUMMARIZE_DB, resolver_context, ','.join(aggregate_summarizers),
+                        statement) as event:
+            event.dialect = session.connection.dialect
+            row = session.connection.execute(statement).fetchone()
+            event.rows = total_data_size
+        elapsed = perf_counter() - start
+
+        summary_results = dict()
+        for summary, summarizer in aggregate_summarizers.items():
+            prefix = f'{summary}__'
+            summary_results[summary] = summarizer.summarize_aggregates({
+                key[len(prefix):]: value for key, value in row.items() if key.startswith(prefix)
+            })
+            # the cost of the shared scan is apportioned equally to the summarizers.
+            summarization_costs.record(summary, DB, total_data_size or 0, elapsed / len(aggregate_summarizers))
+
+        return summary_results
+
+    @classmethod
+    def compute_result_set_summaries(cls, target_summaries, result_set_summarizers, result_set, summary_result=None,
+                                     resolver_context=None):
         if summary_result is None:
             summary_result = dict()
 
+        # The columnar form of the result set is shared by the summarizers that use it.
+        result_columns = None
         for summary in target_summaries:
             if summary not in summary_result and summary in result_set_summarizers:
                 summarizer = result_set_summarizers[summary]
-                summary_result[summary] = summarizer.summarize_result_set(result_set)
+                start = perf_counter()
+                with instrument(instrumentation.SUMMARIZE_RESULT_SET, resolver_context, summary) as event:
+                    if summarizer.is_columnar():
+                        if result_columns is None:
+                            result_columns = ResultColumns(result_set)
+                        summary_result[summary] = summarizer.summarize_columns(result_columns)
+                    else:
+                        summary_result[summary] = summarizer.summarize_result_set(result_set)
+                    event.rows = len(result_set)
+                summarization_costs.record(summary, SERVER, len(result_set), perf_counter() - start)
 
         return summary_result
 
+    @classmethod
+    def cached_summaries(cls, connection_resolver_query, target_summaries):
+        """
+        The summaries in target_summaries that can be served from the summary cache. Cached summaries of
+        incremental summarizers are brought up to date by merging in the rows past their watermark.
+        """
+        summary_result = dict()
+        cache = get_result_cache()
+        for summary in target_summaries:
+            summarizer = ConnectionSummarizer.get_summarizer(summary)
+            if summarizer is None or summarizer.meta('cache_ttl') is None:
+                continue
+
+            key = connection_resolver_query.summary_cache_key(summary)
+            cached = cache.get(key)
+            if cached is None:
+                continue
+
+            summary_value, watermark = cached
+            if summarizer.is_incremental() and watermark is not None:
+                delta = connection_resolver_query.execute_delta(summarizer.meta('watermark'), watermark)
+                if len(delta) > 0:
+                    summary_value = summarizer.merge_result_set(summary_value, delta)
+                    watermark = max(row[summarizer.meta('watermark')] for row in delta)
+                    cls.cache_summary(connection_resolver_query, summarizer, summary, summary_value, watermark)
+
+            summary_result[summary] = summary_value
+
+        return summary_result
+
+    @classmethod
+    def cache_summary(cls, connection_resolver_query, summarizer, summary, summary_value, watermark=None):
+        get_result_cache().set(
+            connection_resolver_query.summary_cache_key(summary),
+            (summary_value, watermark),
+            summarizer.meta('cache_ttl'),
+            result_tags(connection_resolver_query.resolver_context)
+        )
+
+    @classmethod
+    def result_set_watermarks(cls, summaries, result_set):
+        # The watermarks are taken from the rows that were summarized, so that the next delta
+        # starts exactly where the summary ends, whatever was committed since.
+        watermarks = dict()
+        for summary in summaries:
+            summarizer = ConnectionSummarizer.get_summarizer(summary)
+            if summarizer.meta('cache_ttl') is not None and summarizer.is_incremental():
+                column = summarizer.meta('watermark')
+                watermarks[summary] = max(
+                    (row[column] for row in result_set if row[column] is not None), default=None
+                )
+        return watermarks
+
+    @classmethod
+    def temp_table_watermarks(cls, summaries, connection_query_temp, session):
+        # The db summaries are computed over the temp table, so their watermarks are too.
+        watermarks = dict()
+        for summary in summaries:
+            summarizer = ConnectionSummarizer.get_summarizer(summary)
+            if summarizer.meta('cache_ttl') is not None and summarizer.is_incremental():
+                watermarks[summary] = session.connection.execute(
+                    select([func.max(connection_query_temp.c[summarizer.meta('watermark')])])
+                ).scalar()
+        return watermarks
+
+    @classmethod
+    def choose_db_summarizers(cls, db_summarizers, result_set_summarizers, total_data_size, return_result_set):
+        # The summarizers to run in the db are the ones predicted to be cheaper there from the latencies
+        # observed for each summarizer and path. Until there are enough samples to predict from,
+        # summarize in db only for large data sets, or when exploring the db path for smaller ones.
+        chosen = summarization_costs.choose_db_summaries(
+            db_summarizers.keys(), result_set_summarizers.keys(), total_data_size, return_result_set
+        )
+        if chosen is None:
+            use_db = total_data_size > cls.DB_SUMMARIZATION_THRESHOLD or summarization_costs.explore()
+            return db_summarizers if use_db else dict()
+
+        return {summary: summarizer for summary, summarizer in db_summarizers.items() if summary in chosen}
+
     @classmethod
     def resolve_summaries(cls, connection_resolver_query, return_result_set=True, **kwargs):
         summary_result = dict()
@@ -218,40 +521,64 @@ class QueryConnectionField(ConnectionField):
         total_data_size = None
 
         if 'summaries' in kwargs:
-            total_data_size = connection_resolver_query.count()
-            target_summaries = kwargs.get('summaries')
+            cached_summary_result = cls.cached_summaries(connection_resolver_query, kwargs.get('summaries'))
+            target_summaries = [
+                summary for summary in kwargs.get('summaries') if summary not in cached_summary_result
+            ]
             db_summary_result = dict()
-
-            db_summarizers, result_set_summarizers = cls.get_summarizers(target_summaries)
-            summarization_strategy = kwargs.get('summarize')
-
-            if summarization_strategy != ConnectionSummarize.server:
-                # Apply db summarization in those cases where we can do so.
-                if len(db_summarizers) > 0 and (
-                        summarization_strategy == ConnectionSummarize.db  # Client has requested db summarization regardless of size
-                        or total_data_size > cls.DB_SUMMARIZATION_THRESHOLD
-                # Default: summarize in db only for large data sets
-                ):
-                    db_summary_result, result_set = cls.compute_db_summaries(target_summaries, db_summarizers,
-                                                                             connection_resolver_query,
-                                                                             return_result_set)
-
-            # server side summarization applied for the anything that is not covered above.
             result_set_summary_result = dict()
-            if len(db_summary_result) < len(target_summaries):
-                for key in db_summary_result:
-                    target_summaries.pop(key)
-                    result_set_summarizers.pop(key)
-
-                if len(result_set_summarizers) > 0:
-                    if result_set is None:
-                        result_set = connection_resolver_query.execute(to_object=False)
 
-                    result_set_summary_result = cls.compute_result_set_summaries(target_summaries,
-                                                                                 result_set_summarizers, result_set,
-                                                                                 summary_result=db_summary_result)
-
-            summary_result = {**db_summary_result, **result_set_summary_result}
+            if len(target_summaries) > 0:
+                watermarks = dict()
+                total_data_size = connection_resolver_query.count()
+
+                db_summarizers, result_set_summarizers = cls.get_summarizers(target_summaries)
+                summarization_strategy = kwargs.get('summarize')
+
+                if summarization_strategy != ConnectionSummarize.server and len(db_summarizers) > 0:
+                    # Apply db summarization in those cases where we can do so.
+                    if summarization_strategy == ConnectionSummarize.db:
+                        # Client has requested db summarization regardless of size
+                        chosen_summarizers = db_summarizers
+                    else:
+                        chosen_summarizers = cls.choose_db_summarizers(db_summarizers, result_set_summarizers,
+                                                                       total_data_size, return_result_set)
+                    if len(chosen_summarizers) > 0:
+                        db_summary_result, result_set, watermarks = cls.compute_db_summaries(
+                            target_summaries, chosen_summarizers, connection_resolver_query, return_result_set,
+                            total_data_size
+                        )
+
+                # server side summarization applied for the anything that is not covered above.
+                if len(db_summary_result) < len(target_summaries):
+                    for key in db_summary_result:
+                        result_set_summarizers.pop(key, None)
+
+                    if len(result_set_summarizers) > 0:
+                        if result_set is None:
+                            start = perf_counter()
+                            result_set = connection_resolver_query.execute(to_object=False)
+                            summarization_costs.record(RESULT_SET, SERVER, len(result_set), perf_counter() - start)
+
+                        result_set_summary_result = cls.compute_result_set_summaries(
+                            target_summaries,
+                            result_set_summarizers,
+                            result_set,
+                            summary_result=dict(db_summary_result),
+                            resolver_context=connection_resolver_query.resolver_context
+                        )
+                        watermarks.update(cls.result_set_watermarks(
+                            [summary for summary in result_set_summary_result if summary not in db_summary_result],
+                            result_set
+                        ))
+
+                for summary, summary_value in {**db_summary_result, **result_set_summary_result}.items():
+                    summarizer = ConnectionSummarizer.get_summarizer(summary)
+                    if summarizer.meta('cache_ttl') is not None:
+                        cls.cache_summary(connection_resolver_query, summarizer, summary, summary_value,
+                                          watermarks.get(summary))
+
+            summary_result = {**cached_summary_result, **db_summary_result, **result_set_summary_result}
 
         return summary_result, total_data_size, connection_resolver_query.to_object(
             result_set) if return_result_set else None
@@ -264,42 +591,106 @@ class QueryConnectionField(ConnectionField):
     @classmethod
     def connection_resolver(cls, resolver, connection_type, root, info, **kwargs):
         resolved = resolver(root, info, **kwargs)
+        if isinstance(resolved, ConnectionResolverQuery) and resolved.use_batched_connection(kwargs):
+            connection = cls.batched_connection(resolved, connection_type, info, **kwargs)
+            if connection is not None:
+                return connection
+
+        return cls.resolve_connection_result(resolved, connection_type, info, **kwargs)
+
+    @classmethod
+    def resolve_connection_result(cls, resolved, connection_type, info, **kwargs):
         if isinstance(resolved, ConnectionResolverQuery):
-            connection_resolver_query = resolved
-            if kwargs.get('summariesOnly'):
+            # All the queries needed to resolve the connection share one session
+            with request_session():
+                connection = cls.resolve_connection_query(resolved, connection_type, info, **kwargs)
+        else:
+            connection = super().resolve_connection(connection_type, kwargs, resolved)
 
-                summary_result, total_data_size, _ = cls.resolve_summaries(
-                    connection_resolver_query,
-                    return_result_set=False,
-                    **kwargs
-                )
-                iterable = []
-                connection = connection_from_list(
-                    iterable,
-                    kwargs,
-                    connection_type=connection_type,
-                    pageinfo_type=PageInfo,
-                    edge_type=connection_type.Edge,
-                )
-                connection.iterable = iterable
-                connection.count = total_data_size or connection_resolver_query.count()
-                cls.update_connection_properties(
-                    connection,
-                    summary_result
-                )
+        return connection
 
+    @classmethod
+    def batched_connection(cls, connection_resolver_query, connection_type, info, **kwargs):
+        # The pages of the connections of sibling parents are loaded together by a ConnectionLoader.
+        # Returns a promise for the connection, or None if there is no request context to batch in.
+        connection_resolver_query.apply_selection(selected_fields(info, ('edges', 'node')))
+        start_offset, end_offset = cls.slice_offsets(kwargs)
+        loader = get_connection_loader(connection_resolver_query, info, end_offset - start_offset, start_offset)
+        if loader is None:
+            return None
+
+        def page_connection(page):
+            count = page.total_count
+            connection = connection_from_list_slice(
+                page.nodes,
+                kwargs,
+                slice_start=start_offset,
+                list_length=count,
+                list_slice_length=len(page.nodes),
+                connection_type=connection_type,
+                pageinfo_type=PageInfo,
+                edge_type=connection_type.Edge,
+            )
+            connection.iterable = page.nodes
+            connection.count = count
+            return connection
 
-            elif is_paging(kwargs):
-                summary_result, total_data_size, _ = cls.resolve_summaries(
-                    connection_resolver_query,
-                    return_result_set=False,
-                    **kwargs
+        return loader.load(connection_resolver_query.parent_key).then(page_connection)
+
+    @classmethod
+    def resolve_connection_query(cls, connection_resolver_query, connection_type, info, **kwargs):
+        connection_resolver_query.apply_selection(selected_fields(info, ('edges', 'node')))
+        if kwargs.get('summariesOnly'):
+
+            summary_result, total_data_size, _ = cls.resolve_summaries(
+                connection_resolver_query,
+                return_result_set=False,
+                **kwargs
+            )
+            iterable = []
+            connection = connection_from_list(
+                iterable,
+                kwargs,
+                connection_type=connection_type,
+                pageinfo_type=PageInfo,
+                edge_type=connection_type.Edge,
+            )
+            connection.iterable = iterable
+            # summaries may all have been served from the cache, in which case
+            # the count is deferred until it is selected.
+            if total_data_size is not None:
+                connection.count = total_data_size
+            else:
+                cls.defer_count(connection, connection_resolver_query)
+            cls.update_connection_properties(
+                connection,
+                summary_result
+            )
+
+
+        elif is_paging(kwargs):
+            summary_result, total_data_size, _ = cls.resolve_summaries(
+                connection_resolver_query,
+                return_result_set=False,
+                **kwargs
+            )
+            # keyset paging is checked first: window count paging resolves cursors as offsets.
+            if connection_resolver_query.use_keyset_paging(kwargs):
+                # the count is not needed for paging
+                count = total_data_size
+                connection = cls.keyset_connection(connection_resolver_query, kwargs, connection_type)
+            elif total_data_size is None and connection_resolver_query.use_window_count(kwargs):
+                # page and total count are fetched in a single statement.
+                connection, count = cls.window_count_connection(connection_resolver_query, kwargs,
+                                                                connection_type)
+            else:
+                count = total_data_size or connection_resolver_query.paging_count(
+                    kwargs, cls.slice_offsets(kwargs)[1]
                 )
                 # In this case we are relying on the
                 # paging capabilities of the connection_resolver_query to apply
                 # LIMIT and OFFSET to the query based on the slice requested from
                 # connection kwargs and only extract a subset of query rows
-                count = total_data_size or connection_resolver_query.count()
                 connection = connection_from_list_slice(
                     connection_resolver_query,
                     kwargs,
@@ -310,49 +701,182 @@ class QueryConnectionField(ConnectionField):
                     pageinfo_type=PageInfo,
                     edge_type=connection_type.Edge,
                 )
-                connection.iterable = resolved
-                connection.count = count
-                cls.update_connection_properties(
-                    connection,
-                    summary_result
-                )
-
+            connection.iterable = connection_resolver_query
+            if total_data_size is not None:
+                connection.count = total_data_size
             else:
-                # if not we are getting summaries and full result sets.
-                # first try and resolve summaries, and use the full
-                # result set returned from this, if any for the connection
-                summary_result, _, iterable = cls.resolve_summaries(
-                    connection_resolver_query,
-                    return_result_set=True,
-                    **kwargs
-                )
-                if not iterable:
-                    # In this case we need to finally execute the query on our own
-                    # and get the data
-                    iterable = connection_resolver_query.execute()
-
-                count = len(iterable)
-                connection = connection_from_list(
-                    iterable,
-                    kwargs,
-                    connection_type=connection_type,
-                    pageinfo_type=PageInfo,
-                    edge_type=connection_type.Edge,
-                )
-                connection.iterable = iterable
-                connection.count = count
-                cls.update_connection_properties(
-                    connection,
-                    summary_result
-                )
+                cls.defer_count(connection, connection_resolver_query, cls.slice_offsets(kwargs)[1])
+            cls.update_connection_properties(
+                connection,
+                summary_result
+            )
+
+        elif connection_resolver_query.use_streaming(kwargs):
+            connection = cls.streaming_connection(connection_resolver_query, connection_type)
 
         else:
-            connection = super().resolve_connection(connection_type, kwargs, resolved)
+            # if not we are getting summaries and full result sets.
+            # first try and resolve summaries, and use the full
+            # result set returned from this, if any for the connection
+            summary_result, _, iterable = cls.resolve_summaries(
+                connection_resolver_query,
+                return_result_set=True,
+                **kwargs
+            )
+            if not iterable:
+                # In this case we need to finally execute the query on our own
+                # and get the data
+                iterable = connection_resolver_query.execute()
+
+            count = len(iterable)
+            connection = connection_from_list(
+                iterable,
+                kwargs,
+                connection_type=connection_type,
+                pageinfo_type=PageInfo,
+                edge_type=connection_type.Edge,
+            )
+            connection.iterable = iterable
+            connection.count = count
+            cls.update_connection_properties(
+                connection,
+                summary_result
+            )
+
+        return connection
+
+    @staticmethod
+    def defer_count(connection, connection_resolver_query, limit=None):
+        # The count in the count mode of the query is fetched when the count or count mode
+        # of the connection is selected. Counts already fetched for paging are reused.
+        connection.count = lambda: connection_resolver_query.count_with_mode(limit)[0]
+        connection.count_mode = lambda: connection_resolver_query.count_with_mode(limit)[1]
 
+    @classmethod
+    def streaming_connection(cls, connection_resolver_query, connection_type):
+        # The edges are produced from a server side cursor as the response is built, so the
+        # page info is derived from the count rather than from the edges. Nothing is counted
+        # unless the count or the cursors of the page info are selected.
+        edges = StreamingEdges(connection_resolver_query, connection_type.Edge)
+        connection = connection_type(
+            edges=edges,
+            page_info=StreamingPageInfo(connection_resolver_query)
+        )
+        connection.iterable = edges
+        cls.defer_count(connection, connection_resolver_query)
         return connection
 
+    @classmethod
+    def keyset_connection(cls, connection_resolver_query, args, connection_type):
+        # The page is seeked from the cursor on the side it is fetched from, and stops at the other cursor.
+        backward = args.get('last') is not None
+        edges, has_more = connection_resolver_query.execute_keyset(
+            limit=args.get('last') if backward else args.get('first'),
+            cursor=args.get('before') if backward else args.get('after'),
+            backward=backward,
+            bound=args.get('after') if backward else args.get('before')
+        )
+        edges = [connection_type.Edge(node=node, cursor=cursor) for cursor, node in edges]
+        return connection_type(
+            edges=edges,
+            page_info=PageInfo(
+                start_cursor=edges[0].cursor if edges else None,
+                end_cursor=edges[-1].cursor if edges else None,
+                has_previous_page=backward and has_more,
+                has_next_page=not backward and has_more
+            )
+        )
+
+    @staticmethod
+    def slice_offsets(args):
+        # Resolve the requested slice to offsets up front, the same way connection_from_list_slice
+        # would, except that the length of the list is not known until the page has been fetched.
+        # Not applicable to slices requested with last.
+        start_offset = get_offset_with_default(args.get('after'), -1) + 1
+        end_offset = get_offset_with_default(args.get('before'), None)
+        if args.get('first') is not None:
+            end_offset = min(end_offset, start_offset + args['first']) if end_offset is not None \
+                else start_offset + args['first']
+        return start_offset, end_offset
+
+    @classmethod
+    def window_count_connection(cls, connection_resolver_query, args, connection_type):
+        start_offset, end_offset = cls.slice_offsets(args)
+        connection_resolver_query.slice(start_offset, end_offset)
+        nodes, count = connection_resolver_query.execute_window_count()
+        if count is None:
+            # The page is empty, so there is no row to read the total from.
+            count = connection_resolver_query.count()
+
+        connection = connection_from_list_slice(
+            nodes,
+            args,
+            slice_start=start_offset,
+            list_length=count,
+            list_slice_length=len(nodes),
+            connection_type=connection_type,
+            pageinfo_type=PageInfo,
+            edge_type=connection_type.Edge,
+        )
+        return connection, count
+
+    @classmethod
+    async def connection_resolver_async(cls, resolver, connection_type, root, info, **kwargs):
+        resolved = resolver(root, info, **kwargs)
+        if isinstance(resolved, ConnectionResolverQuery) and cls.can_fetch_page_concurrently(resolved, kwargs):
+            resolved.apply_selection(selected_fields(info, ('edges', 'node')))
+            return await cls.concurrent_page_connection(resolved, kwargs, connection_type)
+
+        # Everything else runs the blocking resolution on a worker thread so that
+        # sibling fields can proceed concurrently.
+        return await run_in_thread(cls.resolve_connection_result, resolved, connection_type, info, **kwargs)
+
+    @classmethod
+    def can_fetch_page_concurrently(cls, connection_resolver_query, args):
+        return is_paging(args) and \
+               'summaries' not in args and \
+               not args.get('summariesOnly') and \
+               args.get('last') is None and \
+               not connection_resolver_query.use_window_count(args) and \
+               not connection_resolver_query.use_keyset_paging(args)
+
+    @classmethod
+    async def concurrent_page_connection(cls, connection_resolver_query, args, connection_type):
+        # The count and the page are independent of each other, so they are fetched concurrently
+        start_offset, end_offset = cls.slice_offsets(args)
+        connection_resolver_query.slice(start_offset, end_offset)
+        count, nodes = await asyncio.gather(
+            connection_resolver_query.paging_count_async(args, end_offset),
+            connection_resolver_query.execute_async()
+        )
+        connection = connection_from_list_slice(
+            nodes,
+            args,
+            slice_start=start_offset,
+            list_length=count,
+            list_slice_length=len(nodes),
+            connection_type=connection_type,
+            pageinfo_type=PageInfo,
+            edge_type=connection_type.Edge,
+        )
+        connection.iterable = connection_resolver_query
+        cls.defer_count(connection, connection_resolver_query, end_offset)
+        return connection
+
+    @staticmethod
+    def resolve_with_query_options(resolver, query_options, root, info, **kwargs):
+        resolved = resolver(root, info, **kwargs)
+        if isinstance(resolved, ConnectionResolverQuery):
+            resolved.set_options(**query_options)
+        return resolved
+
     def get_resolver(self, parent_resolver):
-        return partial(self.connection_resolver, parent_resolver, self.type)
+        resolver = parent_resolver
+        if self.query_options:
+            resolver = partial(self.resolve_with_query_options, parent_resolver, self.query_options)
+        if self.async_resolution:
+            return partial(self.connection_resolver_async, resolver, self.type)
+        return partial(self.connection_resolver, resolver, self.type)
 
 
 class ConnectionObjectOptions(ObjectTypeOptions):
@@ -401,6 +925,15 @@ class CountableConnection(Connection):
         setattr(self, snake_case(summary), summary_result)
 
     count = graphene.Int()
+    count_mode = graphene.Field(ConnectionCountMode)
+
+    def resolve_count(self, info, **kwargs):
+        return self.count() if callable(self.count) else self.count
+
+    def resolve_count_mode(self, info, **kwargs):
+        # connections whose count is not deferred are counted exactly.
+        count_mode = self.count_mode() if callable(self.count_mode) else self.count_mode
+        return count_mode or ConnectionCountMode.exact.value
 
 
 def count(selectable):
@@ -408,86 +941,530 @@ def count(selectable):
     return select([func.count(alias.c.key)]).select_from(alias)
 
 
-class ConnectionResolverQuery(ConnectionQuery):
+def capped_count(selectable):
+    alias = selectable.limit(bindparam('_count_limit')).alias()
+    return select([func.count()]).select_from(alias)
+
+
+def window_count(selectable):
+    return selectable.column(func.count().over().label('_total_count'))
+
+
+class StreamingEdges:
+    """
+    Lazily produced edges of an unpaged connection. Each iteration streams the query
+    and yields an edge per row, so only a batch of rows and their objects are held at a time.
+    """
 
-    def __init__(self, connection_resolver, interface_resolvers, resolver_context, params=None, output_type=None, **kwargs):
+    def __init__(self, connection_resolver_query, edge_type):
+        self.connection_resolver_query = connection_resolver_query
+        self.edge_type = edge_type
+
+    def __iter__(self):
+        for index, node in enumerate(self.connection_resolver_query.execute_stream()):
+            yield self.edge_type(node=node, cursor=offset_to_cursor(index))
+
+
+class StreamingPageInfo:
+    """
+    Page info of a streaming connection, which is always the whole list. The cursors
+    are derived from the count of the query when they are resolved.
+    """
+    has_previous_page = False
+    has_next_page = False
+
+    def __init__(self, connection_resolver_query):
+        self.connection_resolver_query = connection_resolver_query
+
+    @property
+    def start_cursor(self):
+        # only needs to know that there is a row
+        return offset_to_cursor(0) if self.connection_resolver_query.capped_count(0) > 0 else None
+
+    @property
+    def end_cursor(self):
+        count = self.connection_resolver_query.count()
+        return offset_to_cursor(count - 1) if count > 0 else None
+
+
+class ConnectionResolverQuery(ConnectionQuery):
+    # Query options: the class level defaults of the options resolved by get_option.
+
+    # Page by seeking past the sort key values encoded in the cursor rather than by OFFSET (non null sort columns only).
+    KEYSET_PAGING = False
+    # Fetch the total count with the page via a COUNT(*) OVER () column, when it is not already known.
+    WINDOW_COUNT = False
+    # Page the named nodes before the interface selectors run; falls back when an interface sort_order pages.
+    LATE_MATERIALIZATION = False
+    # Run each interface selector as its own query against the node ids of a page (paged object results only).
+    SPLIT_INTERFACES = False
+    # Stream unpaged connections without summaries from a server side cursor, STREAM_BATCH_SIZE rows at a time.
+    STREAMING = False
+    STREAM_BATCH_SIZE = 1000
+    # Reuse the db summarization temp table per pooled connection, index its id and key columns, and ANALYZE it.
+    TEMP_TABLE_REUSE = False
+    TEMP_TABLE_INDEXES = False
+    TEMP_TABLE_ANALYZE = False
+
+    def __init__(self, connection_resolver, interface_resolvers, resolver_context, params=None, output_type=None,
+                 keyset_paging=None, window_count=None, late_materialization=None, split_interfaces=None,
+                 streaming=None, stream_batch_size=None, projection_pushdown=None, auto_interfaces=None,
+                 result_cache_ttl=None, temp_table_reuse=None, temp_table_indexes=None, temp_table_analyze=None,
+                 parent_key=None, count_mode=None, count_cap=None, **kwargs):
         super().__init__(**kwargs)
+        self.connection_resolver = connection_resolver
+        self.count_mode = self.get_option(
+            'count_mode', kwargs.get('countMode') if kwargs.get('countMode') is not None else count_mode
+        )
+        self.count_cap = checked_count_cap(self.get_option(
+            'count_cap', kwargs.get('countCap') if kwargs.get('countCap') is not None else count_cap
+        ))
+        self.keyset_paging = self.get_option('keyset_paging', keyset_paging)
+        self.window_count = self.get_option('window_count', window_count)
+        self.late_materialization = self.get_option('late_materialization', late_materialization)
+        self.split_interfaces = self.get_option('split_interfaces', split_interfaces)
+        self.streaming = self.get_option('streaming', streaming)
+        self.stream_batch_size = self.get_option('stream_batch_size', stream_batch_size)
+        self.temp_table_reuse = self.get_option('temp_table_reuse', temp_table_reuse)
+        self.temp_table_indexes = self.get_option('temp_table_indexes', temp_table_indexes)
+        self.temp_table_analyze = self.get_option('temp_table_analyze', temp_table_analyze)
+        # Projection pushdown is a property of the output type: it is only safe if none of
+        # the type's resolvers read attributes of the instance other than the ones selected.
+        self.projection_pushdown = projection_pushdown if projection_pushdown is not None else \
+            getattr(getattr(output_type, '_meta', None), 'projection_pushdown', False)
+        # Likewise automatic interface selection: the interfaces joined are the ones that provide
+        # the selected fields rather than the ones listed by the client.
+        self.auto_interfaces = auto_interfaces if auto_interfaces is not None else \
+            getattr(getattr(output_type, '_meta', None), 'auto_interfaces', False)
+        # Results of count and execute are served from the result cache for this many seconds.
+        # None (the default) means results are not cached.
+        self.result_cache_ttl = result_cache_ttl if result_cache_ttl is not None else \
+            getattr(getattr(output_type, '_meta', None), 'result_cache_ttl', None)
+        self.fields = None
+        self.interface_resolvers = interface_resolvers
         self.resolver_context = resolver_context
-        self.query = cte_join(connection_resolver, collect_join_resolvers(interface_resolvers, **kwargs),
-                              resolver_context, **kwargs)
+        self.join_resolvers = collect_join_resolvers(interface_resolvers, **kwargs)
+        self.kwargs = kwargs
+        self.plan = cte_join_plan(connection_resolver, self.join_resolvers, resolver_context, **kwargs)
+        self.query = self.plan.query
         self.output_type = output_type
+        # The connection of a parent node, which may be resolved in a batch with the connections of its siblings.
+        # params are then the ones shared by all the parents, and the connection_nodes_selector of the resolver
+        # for a single parent gets the parent key in the parameter named by its parent_key_param ('key' by default).
+        self.parent_key = parent_key
+        self.batch_params = params
+        if parent_key is not None:
+            params = {**(params or {}), getattr(connection_resolver, 'parent_key_param', 'key'): parent_key}
         self.params = params
         self.temp_table = None
+        # The total count and the result sets of the query are memoized, so that each is fetched
+        # at most once however many of the summaries, count and edges of the connection need them.
+        self.total_count = None
+        self.capped_counts = dict()
+        self.result_sets = dict()
+        self.summaries_key = None
+
+    def get_option(self, name, value=None):
+        """
+        The value of a query option: the argument of the same name of the query if given, otherwise the attribute
+        of the same name on the connection resolver, otherwise the upper case class level default. The query_options
+        of the QueryConnectionField are applied over all of these via set_options.
+        """
+        if value is not None:
+            return value
+        return getattr(self.connection_resolver, name, getattr(type(self), name.upper()))
+
+    def set_options(self, **options):
+        for name, value in options.items():
+            if value is not None and hasattr(type(self), name.upper()):
+                setattr(self, name, value)
 
     def count(self):
-        with db.create_session() as session:
-            if self.params:
-                return session.execute(count(self.query), self.params).scalar()
-            else:
-                return session.execute(count(self.query)).scalar()
+        if self.total_count is None:
+            statement = self.plan.statement('count', count)
+
+            def fetch_count(session):
+                with instrument(instrumentation.COUNT, self.resolver_context, ConnectionCountMode.exact.value,
+                                statement, self.params, self.interface_names) as event:
+                    event.dialect = session.connection.dialect
+                    event.rows = execute_query(
+                        session.connection, statement, self.params or None, self.plan.cached
+                    ).scalar()
+                return event.rows
+
+            self.total_count = self.cached(statement, self.params, fetch_count, rows=False)
+        return self.total_count
+
+    def capped_count(self, limit):
+        if self.total_count is not None:
+            return min(self.total_count, limit + 1)
+
+        if limit not in self.capped_counts:
+            statement = self.plan.statement('capped_count', capped_count)
+            params = {**(self.params or {}), '_count_limit': limit + 1}
+
+            def fetch_count(session):
+                with instrument(instrumentation.COUNT, self.resolver_context, ConnectionCountMode.capped.value,
+                                statement, params, self.interface_names) as event:
+                    event.dialect = session.connection.dialect
+                    event.rows = execute_query(session.connection, statement, params, self.plan.cached).scalar()
+                return event.rows
+
+            self.capped_counts[limit] = self.cached(statement, params, fetch_count, rows=False)
+            if self.capped_counts[limit] <= limit:
+                # every row was counted
+                self.total_count = self.capped_counts[limit]
+        return self.capped_counts[limit]
+
+    def estimated_count(self):
+        with instrument(instrumentation.COUNT, self.resolver_context, ConnectionCountMode.estimated.value,
+                        self.query, self.params, self.interface_names) as event, \
+                create_session() as session:
+            event.dialect = session.connection.dialect
+            event.rows = planner_estimate(session.connection, self.query, self.params)
+        return event.rows
+
+    @property
+    def interface_names(self):
+        return [resolver.interface.__name__ for resolver in self.join_resolvers]
+
+    def count_with_mode(self, limit=None):
+        # the exact count is reported whenever it is already known.
+        if self.counted is None and self.total_count is not None:
+            self.counted = self.total_count, ConnectionCountMode.exact.value
+        return super().count_with_mode(limit)
+
+    def paging_count(self, args, end_offset=None):
+        """
+        The length of the list that a page of the query is sliced from. A forward page only
+        needs to know whether there are rows past its end, so outside the exact count mode rows are
+        only counted that far, or as far as the cap in the capped mode, so the same count serves
+        for the count of the connection.
+        """
+        if self.count_mode == ConnectionCountMode.exact.value or args.get('last') is not None or end_offset is None:
+            return self.count()
+        if self.count_mode == ConnectionCountMode.capped.value:
+            end_offset = max(end_offset, self.count_cap)
+        return self.capped_count(end_offset)
+
+    def summary_cache_key(self, summary):
+        if self.summaries_key is None:
+            with create_session() as session:
+                self.summaries_key = result_cache_key(
+                    self.query, self.params, session.connection.dialect, self.plan.cached
+                )
+        return f'summary:{summary}:{self.summaries_key}'
+
+    def execute_delta(self, column, watermark):
+        """
+        The rows of the query whose watermark column is past the given watermark.
+        """
+        alias = self.query.alias()
+        delta_query = select(alias.c).where(alias.c[column] > bindparam('_watermark'))
+        with create_session() as session:
+            return execute_query(session.connection, delta_query, {**(self.params or {}), '_watermark': watermark}).fetchall()
+
+    def cached(self, statement, params, fetch, rows=True, join_session=None):
+        # fetch is called with the session the result is fetched on when it is not in the cache.
+        with create_session(join_session) as session:
+            if self.result_cache_ttl is None:
+                return fetch(session)
+            # the statements of uncached plans are built per request, so their compiled forms are not memoized.
+            return cached_result(
+                self.resolver_context, self.result_cache_ttl, statement, params, lambda: fetch(session), rows,
+                session.connection.dialect, self.plan.cached
+            )
+
+    async def paging_count_async(self, args, end_offset=None):
+        return await run_in_thread(self.paging_count, args, end_offset)
+
+    async def execute_async(self, join_session=None, to_object=True):
+        return await run_in_thread(self.execute, join_session, to_object)
+
+    def use_window_count(self, args):
+        # last is resolved relative to the end of the list, so it
+        # needs the count before the page can be fetched.
+        return self.window_count and not self.plan.distinct and args.get('last') is None
+
+    def execute_window_count(self, join_session=None):
+        """
+        Execute the current slice of the query along with the total count of rows in the
+        query. Returns the page and the count, or None for the count if the page is empty.
+        """
+        plan = self.object_plan()
+        base_query = plan.paged_statement(bool(self.limit), bool(self.offset), 'window_count', window_count)
+        params = {**(self.params or {}), **paging_params(self.limit, self.offset)}
+
+        with instrument(instrumentation.EXECUTE, self.resolver_context, 'window_count', base_query, params,
+                        self.interface_names) as event, \
+                create_session(join_session) as session:
+            event.dialect = session.connection.dialect
+            result = execute_query(session.connection, base_query, params, plan.cached).fetchall()
+            event.rows = len(result)
+
+        total = result[0]['_total_count'] if len(result) > 0 else None
+        if total is not None:
+            self.total_count = total
+        return self.to_object(result, plan.column_names) if self.output_type else result, total
+
+    def use_keyset_paging(self, args):
+        if not self.keyset_paging or not self.plan.supports_keyset_paging:
+            return False
+
+        if args.get('first') is not None and args.get('last') is not None:
+            return False
+
+        # offset cursors issued before keyset paging was enabled are served by offset paging.
+        return all(
+            is_keyset_cursor(args[cursor]) for cursor in ('after', 'before') if args.get(cursor) is not None
+        )
+
+    def execute_keyset(self, limit=None, cursor=None, backward=False, bound=None, join_session=None):
+        """
+        Fetch the page of at most limit rows following (or when paging backward, preceding)
+        the row identified by the keyset cursor, and preceding (following) the row identified by
+        the keyset cursor bound. Returns a list of (cursor, node) pairs in
+        connection order, and a flag indicating whether there are more rows past the page.
+        """
+        plan = self.object_plan()
+        values = self.keyset_values(plan, cursor)
+        bound_values = self.keyset_values(plan, bound)
+
+        statement = plan.keyset_statement(
+            backward, seek=values is not None, limited=limit is not None, bounded=bound_values is not None
+        )
+        params = {
+            **(self.params or {}),
+            **plan.keyset_params(values, limit + 1 if limit is not None else None, bound_values)
+        }
+
+        with instrument(instrumentation.EXECUTE, self.resolver_context, 'keyset', statement, params,
+                        self.interface_names) as event, \
+                create_session(join_session) as session:
+            event.dialect = session.connection.dialect
+            result = execute_query(session.connection, statement, params, plan.cached).fetchall()
+            event.rows = len(result)
+
+        has_more = limit is not None and len(result) > limit
+        if has_more:
+            result = result[:limit]
+        if backward:
+            result.reverse()
+
+        cursors = [keyset_cursor([row[column] for column in plan.keyset_columns]) for row in result]
+        nodes = self.to_object(result, plan.column_names) if self.output_type else result
+        return list(zip(cursors, nodes)), has_more
+
+    def keyset_values(self, plan, cursor):
+        if cursor is None:
+            return None
+
+        values = keyset_cursor_values(cursor)
+        if len(values) != len(plan.keyset_columns):
+            raise GraphQLImplementationError(
+                f'Context: {self.resolver_context}: cursor {cursor} does not match the sort order of the connection'
+            )
+        return values
 
     @contextmanager
     def create_temp_table(self, session):
         try:
-            if self.temp_table is None:
-                self.temp_table = db.create_temp_table(f'{self.resolver_context}_connection_temp', self.query.c)
-                self.temp_table.create(session.connection)
-
-            insert_temp_table = self.temp_table.insert().from_select(
-                self.query.c,
-                self.query
-            )
-            session.connection.execute(insert_temp_table, self.params)
+            with instrument(instrumentation.TEMP_TABLE, self.resolver_context, statement=self.query,
+                            params=self.params, interfaces=self.interface_names) as event:
+                event.dialect = session.connection.dialect
+                if self.temp_table is None:
+                    self.temp_table = prepare_temp_table(
+                        session.connection,
+                        f'{self.resolver_context}_connection_temp',
+                        self.query.c,
+                        reuse=self.temp_table_reuse,
+                        indexes=self.temp_table_indexes
+                    )
+
+                insert_temp_table = self.temp_table.insert().from_select(
+                    self.query.c,
+                    self.query
+                )
+                inserted = session.connection.execute(insert_temp_table, self.params).rowcount
+                # rowcount is -1 where the driver does not report it for INSERT .. SELECT
+                event.rows = inserted if inserted >= 0 else None
+                if self.temp_table_analyze:
+                    analyze_temp_table(session.connection, self.temp_table)
             yield self.temp_table
+            release_temp_table(session.connection, self.temp_table, reuse=self.temp_table_reuse)
         finally:
             self.temp_table = None
 
     def select_temp_table(self, join_session=None, to_object=True):
-        with db.create_session(join_session) as session:
-            result = session.connection.execute(select(self.temp_table.c)).fetchall()
-            return self.to_object(result) if self.output_type and to_object else result
-
-    def to_object(self, result):
-        return [
-            self.output_type(**{key: value for key, value in row.items()})
-            for row in result
-        ] if result is not None and self.output_type else []
+        statement = select(self.temp_table.c)
+        with instrument(instrumentation.EXECUTE, self.resolver_context, 'temp_table', statement,
+                        interfaces=self.interface_names) as event, \
+                create_session(join_session) as session:
+            event.dialect = session.connection.dialect
+            result = session.connection.execute(statement).fetchall()
+            event.rows = len(result)
+        return self.to_object(result) if self.output_type and to_object else result
+
+    def to_object(self, result, columns=None):
+        if result is None or not self.output_type:
+            return []
+        with instrument(instrumentation.TO_OBJECT, self.resolver_context) as event:
+            event.rows = len(result)
+            return to_objects(self.output_type, result, columns)
 
     def execute(self, join_session=None, to_object=True):
-        if self.temp_table is not None:
-            return self.select_temp_table(join_session, to_object)
+        key = (to_object, self.limit, self.offset)
+        if key in self.result_sets:
+            return self.result_sets[key]
+
+        rows_key = (False, self.limit, self.offset)
+        if to_object and self.output_type and rows_key in self.result_sets:
+            # the objects can be built from the rows already fetched for the summaries.
+            result = self.to_object(self.result_sets[rows_key])
+        else:
+            result = self.fetch(join_session, to_object)
 
-        base_query = self.query
-        if self.limit:
-            base_query = base_query.limit(self.limit)
+        self.result_sets[key] = result
+        return result
 
-        if self.offset:
-            base_query = base_query.offset(self.offset)
+    def fetch(self, join_session=None, to_object=True):
+        if self.temp_table is not None:
+            return self.select_temp_table(join_session, to_object)
 
-        with db.create_session(join_session) as session:
-            if self.params is not None:
-                result = session.execute(base_query, self.params).fetchall()
-            else:
-                result = session.execute(base_query).fetchall()
+        if self.use_split_interfaces(to_object):
+            return self.execute_split(join_session)
 
-            return self.to_object(result) if self.output_type and to_object else result
+        plan = self.page_plan() if to_object else None
+        if plan is not None:
+            base_query = plan.query
+            params = {**(self.params or {}), **plan.page_params(self.limit, self.offset)}
+        else:
+            plan = self.object_plan() if to_object else self.plan
+            base_query = plan.paged_statement(bool(self.limit), bool(self.offset))
+            params = {**(self.params or {}), **paging_params(self.limit, self.offset)}
+
+        def fetch_rows(session):
+            with instrument(instrumentation.EXECUTE, self.resolver_context, statement=base_query, params=params,
+                            interfaces=self.interface_names) as event:
+                event.dialect = session.connection.dialect
+                result = execute_query(session.connection, base_query, params, plan.cached).fetchall()
+                event.rows = len(result)
+            return result
+
+        result = self.cached(base_query, params, fetch_rows, join_session=join_session)
+        return self.to_object(result) if self.output_type and to_object else result
+
+    def use_batched_connection(self, args):
+        # Only the forward offset paged slices of connections without summaries are the same
+        # for all the parents, and resolvable from a single page query partitioned by parent.
+        return self.parent_key is not None and \
+               hasattr(self.connection_resolver, 'batch_connection_nodes_selector') and \
+               'apply_distinct' not in self.kwargs and \
+               args.get('first') is not None and \
+               args.get('last') is None and \
+               args.get('before') is None and \
+               'summaries' not in args and \
+               not args.get('summariesOnly') and \
+               not self.use_keyset_paging(args)
+
+    def use_streaming(self, args):
+        return self.streaming and not is_paging(args) and 'summaries' not in args and not args.get('summariesOnly')
+
+    def execute_stream(self, to_object=True):
+        """
+        Generator over the result of the query, fetched from a server side cursor
+        stream_batch_size rows at a time. Results are not memoized.
+        """
+        plan = self.object_plan() if to_object else self.plan
+        # The cursor holds its connection until the stream is exhausted, which is after connection
+        # resolution has returned, so it uses a session of its own rather than the request session.
+        with db.create_session() as session:
+            result = execute_query(
+                session.connection.execution_options(stream_results=True), plan.query, self.params, plan.cached
+            )
+            try:
+                yield from iter_objects(self.output_type if to_object else None, result, self.stream_batch_size)
+            finally:
+                result.close()
+
+    def use_split_interfaces(self, to_object):
+        # Only pages are split, so that the number of node ids bound into the interface queries is bounded.
+        return self.split_interfaces and to_object and self.output_type and self.limit and \
+            can_split_join(self.connection_resolver, self.join_resolvers, **self.kwargs)
+
+    def execute_split(self, join_session=None):
+        plan = split_join_plan(self.connection_resolver, self.join_resolvers, self.resolver_context,
+                               page_nodes=True, fields=self.fields, **self.kwargs)
+        with instrument(instrumentation.EXECUTE, self.resolver_context, 'split') as event:
+            rows = resolve_split_join(
+                plan,
+                self.params,
+                page_params=dict(_nodes_limit=self.limit, _nodes_offset=self.offset or 0),
+                join_session=join_session
+            )
+            event.rows = len(rows)
+        return self.to_object(rows)
+
+    def apply_selection(self, fields):
+        if self.auto_interfaces:
+            self.kwargs = dict(
+                self.kwargs,
+                interfaces=select_interfaces(self.connection_resolver, self.interface_resolvers, fields, **self.kwargs)
+            )
+            self.join_resolvers = collect_join_resolvers(self.interface_resolvers, **self.kwargs)
+            self.plan = cte_join_plan(self.connection_resolver, self.join_resolvers, self.resolver_context,
+                                      **self.kwargs)
+            self.query = self.plan.query
+
+        if self.projection_pushdown:
+            self.fields = fields
+
+        self.result_sets.clear()
+
+    def object_plan(self):
+        # The plan used when the result is materialized as objects. Projection only applies here:
+        # summaries and temp tables always see every column of the full plan.
+        if self.fields is None:
+            return self.plan
+        return cte_join_plan(self.connection_resolver, self.join_resolvers, self.resolver_context,
+                             fields=self.fields, **self.kwargs)
+
+    def page_plan(self):
+        # The late materialization plan only applies to the paged execution of the query,
+        # count, summaries etc. are always computed over the full plan.
+        if self.late_materialization and self.limit:
+            plan = cte_join_plan(self.connection_resolver, self.join_resolvers, self.resolver_context,
+                                 page_nodes=True, fields=self.fields, **self.kwargs)
+            if plan.paged_nodes:
+                return plan
 
 
 class ConnectionSummarizerOptions(ObjectTypeOptions):
     interface = None
     connection_property = None
+    cache_ttl = None
+    watermark = None
 
 
 class ConnectionSummarizer(SubclassWithMeta):
     registry = dict()
 
     @classmethod
-    def __init_subclass_with_meta__(cls, interface=None, connection_property=None, **meta_options):
+    def __init_subclass_with_meta__(cls, interface=None, connection_property=None, cache_ttl=None, watermark=None,
+                                    **meta_options):
         _meta = ConnectionSummarizerOptions(cls)
         _meta.interface = interface
+        # Summaries are cached for cache_ttl seconds per connection query and params.
+        _meta.cache_ttl = cache_ttl
+        # Summarizers that also define merge_result_set(summary, rows) are incremental: a cached summary
+        # is brought up to date by merging in the rows of the connection whose watermark column is past
+        # the one recorded with the summary, rather than being recomputed. This is only correct for
+        # connections whose changes are new rows ordered by the watermark.
+        _meta.watermark = watermark
         if interface:
             interface_name = interface.__name__
             _meta.connection_property = connection_property or snake_case(interface_name)
+            register_interface(interface)
             cls.register(interface_name, cls)
 
         cls._meta = _meta
@@ -501,6 +1478,25 @@ class ConnectionSummarizer(SubclassWithMeta):
     def get_summarizer(cls, interface_name):
         return cls.registry.get(interface_name)
 
+    @classmethod
+    def is_aggregate(cls):
+        # Summarizers may define summary_aggregates(connection_query_temp) returning a dict of named scalar
+        # aggregate expressions over the temp table, and summarize_aggregates(values) to build the summary from
+        # a dict of their values, instead of summarize_db. The aggregates of all the requested summarizers that
+        # do so are then computed together in a single scan of the temp table.
+        return hasattr(cls, 'summary_aggregates') and hasattr(cls, 'summarize_aggregates')
+
+    @classmethod
+    def is_columnar(cls):
+        # Summarizers may define summarize_columns(columns), which receives the result set as a ResultColumns
+        # mapping of column names to NumPy arrays, so that the summary can be computed with vectorized operations.
+        # It is preferred over summarize_result_set when numpy is installed.
+        return hasattr(cls, 'summarize_columns') and columnar_available()
+
+    @classmethod
+    def is_incremental(cls):
+        return cls.meta('watermark') is not None and hasattr(cls, 'merge_result_set')
+
     @classmethod
     def meta(cls, attr):
         return getattr(cls._meta, attr, None)
@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+
+# Copyright: © Exathink, LLC (2011-2018) All Rights Reserved
+
+# Unauthorized use or copying of this file and its contents, via any medium
+# is strictly prohibited. The work product in this file is proprietary and
+# confidential.
+
+# Author: Krishna Kumar
+
+import hashlib
+import logging
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from threading import Lock
+from time import perf_counter
+
+from .cache_utils import LRUCache
+from . import slow_queries
+
+logger = logging.getLogger('polaris.graphql.instrumentation')
+
+# The instrumented operations
+BUILD = 'build'
+EXECUTE = 'execute'
+COUNT = 'count'
+TEMP_TABLE = 'temp_table'
+SUMMARIZE_DB = 'summarize_db'
+SUMMARIZE_RESULT_SET = 'summarize_result_set'
+TO_OBJECT = 'to_object'
+
+# Operations that execute their statement, and so are checked against the slow query log.
+STATEMENT_OPERATIONS = frozenset([EXECUTE, COUNT, TEMP_TABLE, SUMMARIZE_DB])
+
+# The instrumentation collected for the request by the innermost active request_instrumentation block.
+active_instrumentation = ContextVar('polaris_instrumentation', default=None)
+
+# Statements are mostly memoized on plans, so their fingerprints are too.
+fingerprints = LRUCache(maxsize=1024)
+
+
+def sql_fingerprint(statement, dialect=None):
+    """
+    A short digest of the SQL text of statement, as compiled for the dialect it was executed with.
+    Parameter values are bound rather than part of the text, so the fingerprint identifies the
+    statement across requests.
+    """
+    return fingerprints.get_or_create(
+        statement,
+        lambda: hashlib.sha1(str(statement.compile(dialect=dialect)).encode('utf-8')).hexdigest()[:16]
+    )
+
+
+class QueryEvent:
+    __slots__ = ('operation', 'resolver_context', 'name', 'statement', 'params', 'interfaces', 'dialect', 'fingerprint',
+                 'rows', 'duration')
+
+    def __init__(self, operation, resolver_context, name=None, statement=None, params=None, interfaces=None):
+        self.operation = operation
+        self.resolver_context = resolver_context
+        self.name = name
+        self.statement = statement
+        self.params = params
+        self.interfaces = interfaces
+        self.dialect = None
+        self.fingerprint = None
+        self.rows = None
+        self.duration = None
+
+    def to_dict(self):
+        return dict(
+            operation=self.operation,
+            resolverContext=self.resolver_context,
+            name=self.name,
+            fingerprint=self.fingerprint,
+            rows=self.rows,
+            duration=self.duration
+        )
+
+
+class RequestInstrumentation:
+    """
+    The events recorded while resolving a request. Events may be recorded from the
+    worker threads that connections are resolved on.
+    """
+
+    def __init__(self):
+        self.events = []
+        self.lock = Lock()
+
+    def record(self, event):
+        with self.lock:
+            self.events.append(event)
+
+    def totals(self):
+        # wall time and rows per resolver context and operation
+        totals = defaultdict(lambda: dict(count=0, duration=0.0, rows=0))
+        with self.lock:
+            for event in self.events:
+                total = totals[f'{event.resolver_context}:{event.operation}']
+                total['count'] += 1
+                total['duration'] += event.duration
+                total['rows'] += event.rows or 0
+        return dict(totals)
+
+    def to_dict(self):
+        with self.lock:
+            events = [event.to_dict() for event in self.events]
+        return dict(events=events, totals=self.totals())
+
+
+class LoggingSink:
+    """
+    Sink that logs each event.
+    """
+
+    def __init__(self, level=logging.DEBUG):
+        self.level = level
+
+    def __call__(self, event):
+        logger.log(
+            self.level,
+            f'{event.resolver_context} {event.operation}'
+            f'{f" {event.name}" if event.name else ""}: {event.duration * 1000:.2f}ms'
+            f'{f" rows={event.rows}" if event.rows is not None else ""}'
+            f'{f" sql={event.fingerprint}" if event.fingerprint else ""}'
+        )
+
+
+# The sink that events recorded outside a request_instrumentation block are emitted to:
+# any callable that takes a QueryEvent. None (the default) disables instrumentation outside those blocks.
+instrumentation_sink = None
+
+
+def set_instrumentation_sink(sink):
+    global instrumentation_sink
+    instrumentation_sink = sink
+
+
+def get_instrumentation_sink():
+    return instrumentation_sink
+
+
+@contextmanager
+def request_instrumentation():
+    """
+    Collect the events recorded within the block in the RequestInstrumentation it yields,
+    instead of emitting them to the instrumentation sink.
+    """
+    instrumentation = RequestInstrumentation()
+    token = active_instrumentation.set(instrumentation)
+    try:
+        yield instrumentation
+    finally:
+        active_instrumentation.reset(token)
+
+
+def execute_instrumented(schema, *args, **kwargs):
+    """
+    Execute a request against schema, returning the result with the instrumentation
+    of the request in the instrumentation key of its extensions.
+    """
+    with request_instrumentation() as instrumentation:
+        result = schema.execute(*args, **kwargs)
+    result.extensions = {**(result.extensions or {}), 'instrumentation': instrumentation.to_dict()}
+    return result
+
+
+def is_instrumented():
+    return active_instrumentation.get() is not None or instrumentation_sink is not None
+
+
+@contextmanager
+def instrument(operation, resolver_context, name=None, statement=None, params=None, interfaces=None):
+    """
+    Time the block as an operation for resolver_context. The block may set the rows and statement of the
+    event it is given, and the dialect of the connection the statement is executed on. Events are only recorded, and statements only fingerprinted, when instrumentation
+    is active, and not for blocks that raise. Events for statements are also checked against the slow query log.
+    """
+    event = QueryEvent(operation, resolver_context, name, statement, params, interfaces)
+    start = perf_counter()
+    yield event
+    event.duration = perf_counter() - start
+    if is_instrumented():
+        record(event)
+    if slow_queries.slow_query_log is not None and operation in STATEMENT_OPERATIONS:
+        slow_queries.slow_query_log.check(event)
+
+
+def record(event):
+    # instrumentation never fails a request
+    if event.statement is not None:
+        try:
+            event.fingerprint = sql_fingerprint(event.statement, event.dialect)
+        except Exception as exc:
+            logger.warning(f'Statement fingerprint failed: {exc}')
+
+    instrumentation = active_instrumentation.get()
+    if instrumentation is not None:
+        instrumentation.record(event)
+    elif instrumentation_sink is not None:
+        try:
+            instrumentation_sink(event)
+        except Exception as exc:
+            logger.warning(f'Instrumentation sink failed: {exc}')
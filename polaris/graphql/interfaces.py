@@ -52,3 +52,24 @@ class ConnectionSummarize(graphene.Enum):
     db = 'db'
     server = 'server'
     default = 'default'
+
+
+class ConnectionCountMode(graphene.Enum):
+    class Meta:
+        description = """
+        Options for computing the count of a connection.
+        
+        Values:
+        
+        exact: Count every row of the connection.
+        estimated: Report the query planner's estimate of the number of rows, where the database provides one.
+        capped: Count rows up to the cap given by countCap. A count reported in this mode means that there are more 
+        rows than the count. 
+        
+        The countMode field of the connection reports the mode that produced its count, which is exact whenever 
+        the count is.
+        """
+
+    exact = 'exact'
+    estimated = 'estimated'
+    capped = 'capped'
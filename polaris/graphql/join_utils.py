@@ -7,32 +7,57 @@
 # confidential.
 
 # Author: Krishna Kumar
+import json
 import logging
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
 
-from sqlalchemy import text, select, join
+from sqlalchemy import text, select, join, and_, or_, bindparam, func
+from sqlalchemy.sql.elements import UnaryExpression
+from sqlalchemy.sql import operators
 
 from polaris.common import db
-from polaris.graphql.utils import properties
-from .utils import is_paging, GraphQLImplementationError, is_required
+from .utils import is_paging, GraphQLImplementationError, freeze, interface_fields, run_in_thread
+from .cache_utils import LRUCache
+from .records import to_objects
+from .session_utils import create_session
+from .instrumentation import instrument, BUILD, EXECUTE
+from .slow_queries import explain
+
+# Paging arguments only affect the shape of a cte_join through is_paging, so
+# they are folded into a single flag in the plan cache key, which lets every page of a
+# connection share the same plan.
+PAGING_ARGS = frozenset(['first', 'last', 'before', 'after'])
+# Arguments that change how a connection is counted, but not the plan of its query.
+COUNT_ARGS = frozenset(['countMode', 'countCap'])
+
+# Bounded caches for built cte_join plans and for the SQLAlchemy compiled forms
+# of the statements derived from them. Steady state requests should only
+# need to bind new parameters.
+plan_cache = LRUCache(maxsize=512)
+compiled_cache = LRUCache(maxsize=1024)
 
 
 def resolve_local_join(result_rows, join_field, output_type):
     if len(result_rows) == 1:
-        instances = result_rows[0]
-    else:
-        instance_hash = {}
-        for rows in result_rows:
-            for row in rows:
-                join_value = row[join_field]
-                if join_value is not None:
-                    current = instance_hash.get(join_value, None)
-                    if current is None:
-                        instance_hash[join_value] = {}
-                    for key, value in row.items():
-                        instance_hash[join_value][key] = value
-        instances = instance_hash.values()
-
-    return [output_type(**instance) for instance in instances]
+        return to_objects(output_type, result_rows[0])
+
+    # Instances are only present in the result sets that have rows for them, so
+    # the merged instances may each have a different subset of the columns.
+    columns = {}
+    instance_hash = {}
+    for rows in result_rows:
+        for row in rows:
+            join_value = row[join_field]
+            if join_value is not None:
+                current = instance_hash.get(join_value, None)
+                if current is None:
+                    instance_hash[join_value] = {}
+                for key, value in row.items():
+                    columns[key] = None
+                    instance_hash[join_value][key] = value
+
+    return to_objects(output_type, list(instance_hash.values()), tuple(columns))
 
 
 def text_join(resolvers, resolver_context, join_field='id', **kwargs):
@@ -47,7 +72,7 @@ def text_join(resolvers, resolver_context, join_field='id', **kwargs):
         seen_columns = set()
         output_columns = []
         for resolver in resolvers:
-            for field in properties(resolver.interface):
+            for field in interface_fields(resolver.interface).fields:
                 if field not in seen_columns:
                     seen_columns.add(field)
                     output_columns.append(text(f'{alias(resolver.interface)}.{field}'))
@@ -73,9 +98,9 @@ def text_join(resolvers, resolver_context, join_field='id', **kwargs):
 
 
 def resolve_remote_join(queries, output_type, join_field='id', params=None):
-    with db.create_session() as session:
+    with create_session() as session:
         result = session.execute(text_join(queries, join_field), params).fetchall()
-        return [output_type(**{key: value for key, value in row.items()}) for row in result]
+        return to_objects(output_type, result)
 
 
 def resolve_named_node_resolver_for_view(named_node_resolver, **kwargs):
@@ -86,38 +111,424 @@ def resolve_named_node_resolver_for_view(named_node_resolver, **kwargs):
         return named_node_resolver
 
 
+named_node_resolver_fields = dict()
+
+
 def get_named_node_resolver_interface_fields(named_node_resolver):
-    if hasattr(named_node_resolver, 'interface'):
-        return properties(named_node_resolver.interface)
-    elif hasattr(named_node_resolver, 'interfaces'):
-        fields = []
-        for interface in named_node_resolver.interfaces:
-            fields.extend(properties(interface))
-        return fields
+    fields = named_node_resolver_fields.get(named_node_resolver)
+    if fields is None:
+        if hasattr(named_node_resolver, 'interface'):
+            fields = interface_fields(named_node_resolver.interface).fields
+        elif hasattr(named_node_resolver, 'interfaces'):
+            fields = tuple(
+                field
+                for interface in named_node_resolver.interfaces
+                for field in interface_fields(interface).fields
+            )
+        else:
+            fields = ()
+        named_node_resolver_fields[named_node_resolver] = fields
+
+    return fields
+
+
+class CteJoinPlan:
+    """
+    The result of building a cte_join: the final select along with the parts it
+    was assembled from. Plans are shared across requests via the plan cache, so they must
+    be treated as immutable. Statements derived from the plan (count queries etc.) are memoized
+    on the plan via statement() so that they too compile only once.
+    """
+
+    def __init__(self, query, named_nodes_query, subqueries, output_columns, joined, sort_order, join_field='id',
+                 distinct=False, paged_nodes=False, batch_parents=False):
+        self.query = query
+        self.named_nodes_query = named_nodes_query
+        self.subqueries = subqueries
+        self.output_columns = output_columns
+        self.column_names = [column.key for column in output_columns]
+        self.joined = joined
+        self.sort_order = sort_order
+        self.join_field = join_field
+        self.distinct = distinct
+        self.paged_nodes = paged_nodes
+        self.batch_parents = batch_parents
+        self.statements = dict()
+        # set for plans that are shared via the plan cache
+        self.cached = False
+
+    def statement(self, name, factory):
+        statement = self.statements.get(name)
+        if statement is None:
+            statement = factory(self.query)
+            self.statements[name] = statement
+        return statement
+
+    # Keyset paging
+
+    @property
+    def supports_keyset_paging(self):
+        return not self.distinct
+
+    @property
+    def keyset_sort_keys(self):
+        """
+        The (column expression, descending) pairs that determine the position of a row in
+        the sort order. The join field of the named nodes is always appended as a tie breaker so that
+        the order is total.
+        """
+        keys = [sort_key(expression) for expression in self.sort_order]
+        tie_breaker = self.named_nodes_query.c[self.join_field]
+        if not any(element is tie_breaker for element, _ in keys):
+            keys.append((tie_breaker, False))
+        return keys
+
+    @property
+    def keyset_columns(self):
+        return [f'_keyset_{i}' for i in range(len(self.keyset_sort_keys))]
+
+    def keyset_statement(self, backward=False, seek=False, limited=False, bounded=False):
+        return self.statement(
+            ('keyset', backward, seek, limited, bounded),
+            lambda query: self.build_keyset_statement(backward, seek, limited, bounded)
+        )
+
+    def build_keyset_statement(self, backward, seek, limited, bounded=False):
+        # When paging backwards the sort order is reversed so that the rows adjacent
+        # to the cursor come first. Callers restore the original order after fetching.
+        # A bounded page also stops before the row bound to _keyset_bound_0.._keyset_bound_n,
+        # the other cursor of the page.
+        sort_keys = [
+            (element, not descending if backward else descending)
+            for element, descending in self.keyset_sort_keys
+        ]
+        columns = self.output_columns + [
+            element.label(label) for (element, _), label in zip(sort_keys, self.keyset_columns)
+        ]
+        statement = select(columns).select_from(self.joined)
+        if seek:
+            statement = statement.where(seek_predicate(sort_keys))
+        if bounded:
+            statement = statement.where(seek_predicate(
+                [(element, not descending) for element, descending in sort_keys], '_keyset_bound'
+            ))
+
+        statement = statement.order_by(*[
+            element.desc() if descending else element.asc()
+            for element, descending in sort_keys
+        ])
+        if limited:
+            statement = statement.limit(bindparam('_keyset_limit'))
+
+        return statement
+
+    def page_params(self, limit, offset=None):
+        return dict(_nodes_limit=limit, _nodes_offset=offset or 0)
+
+    def paged_statement(self, limited=False, offset=False, base='query', factory=None):
+        """
+        The statement for a page of the query, or of the statement derived from it by factory, with
+        LIMIT and OFFSET bound to the parameters _limit and _offset, so that every page
+        of a connection is the same statement and compiles to the same SQL text. The OFFSET of a limited
+        page is bound even when it is 0, since dialects omit the clause for pages without one.
+        """
+        offset = limited or offset
+        if factory is not None:
+            statement = self.statement(base, factory)
+        else:
+            statement = self.query
+        return self.statement(
+            (base, 'paged', limited, offset),
+            lambda query: paged_statement(statement, limited, offset)
+        )
+
+    # Batched nested connections
+
+    def partitioned_page_statement(self):
+        return self.statement('partitioned_page', lambda query: self.build_partitioned_page_statement())
+
+    def build_partitioned_page_statement(self):
+        """
+        For a batch_parents plan: the same page of the connection of each parent in the batch, selected
+        in one statement. Rows are numbered within each parent in the sort order of the connection, and carry
+        the parent_key, the row number and the total count of rows for their parent. The page is bound to the
+        parameters _partition_offset and _partition_limit.
+        """
+        parent_key = self.named_nodes_query.c.parent_key
+        order_by = [
+            element.desc() if descending else element.asc()
+            for element, descending in self.keyset_sort_keys
+        ]
+        ranked = select(self.output_columns + [
+            parent_key,
+            func.row_number().over(partition_by=parent_key, order_by=order_by).label('_row_number'),
+            func.count().over(partition_by=parent_key).label('_total_count')
+        ]).select_from(self.joined).alias('partitioned')
+
+        # The first row of each parent is always selected so that the count is known for parents
+        # that have no rows past the offset. Callers discard it when it is not on the page.
+        return select(ranked.c).where(
+            or_(
+                and_(
+                    ranked.c._row_number > bindparam('_partition_offset'),
+                    ranked.c._row_number <= bindparam('_partition_offset') + bindparam('_partition_limit')
+                ),
+                ranked.c._row_number == 1
+            )
+        ).order_by(ranked.c.parent_key, ranked.c._row_number)
+
+    def partition_params(self, limit, offset=None):
+        return dict(_partition_limit=limit, _partition_offset=offset or 0)
+
+    def keyset_params(self, values=None, limit=None, bound=None):
+        params = dict()
+        if values is not None:
+            params.update({f'_keyset_{i}': value for i, value in enumerate(values)})
+        if bound is not None:
+            params.update({f'_keyset_bound_{i}': value for i, value in enumerate(bound)})
+        if limit is not None:
+            params['_keyset_limit'] = limit
+        return params
+
+
+def paged_statement(statement, limited=False, offset=False):
+    if limited:
+        statement = statement.limit(bindparam('_limit'))
+    if limited or offset:
+        statement = statement.offset(bindparam('_offset'))
+    return statement
+
+
+def paging_params(limit=None, offset=None):
+    # _offset is bound along with _limit, so that the first page is the same statement as the rest.
+    params = dict()
+    if limit:
+        params['_limit'] = limit
+    if limit or offset:
+        params['_offset'] = offset or 0
+    return params
+
+
+def sort_key(expression):
+    """
+    Decompose a sort order expression into the underlying column expression and its direction.
+    """
+    descending = False
+    element = expression
+    while isinstance(element, UnaryExpression) and element.modifier in (
+            operators.asc_op, operators.desc_op, operators.nullsfirst_op, operators.nullslast_op
+    ):
+        if element.modifier is operators.desc_op:
+            descending = True
+        element = element.element
+
+    return element, descending
+
+
+def seek_predicate(sort_keys, parameter='_keyset'):
+    """
+    The predicate selecting rows that sort strictly after the row whose sort key values are bound to the
+    parameters <parameter>_0..<parameter>_n, _keyset_0.._keyset_n by default. Mixed sort directions rule out
+    a row value comparison, so this is expanded as (k0 > v0) OR (k0 = v0 AND k1 > v1) OR ...
+
+    Sort key values must be non null: a null in any sort key column excludes the
+    row from the seek.
+    """
+    clauses = []
+    for i, (element, descending) in enumerate(sort_keys):
+        value = bindparam(f'{parameter}_{i}')
+        clauses.append(
+            and_(
+                *[prefix == bindparam(f'{parameter}_{j}') for j, (prefix, _) in enumerate(sort_keys[:i])],
+                element < value if descending else element > value
+            )
+        )
+    return or_(*clauses)
+
+
+def plan_cache_key(named_nodes_resolver, subquery_resolvers, resolver_context, join_field, build_options, **kwargs):
+    # Plans are only cached if every resolver in the join opts in by setting cache_query_plan = True,
+    # which asserts that its selectors are a pure function of their kwargs: any value computed when the
+    # query is built (for example a date window computed from the current time) must be a bind parameter.
+    if not getattr(named_nodes_resolver, 'cache_query_plan', False):
+        return None
+    for resolver in subquery_resolvers:
+        if not getattr(resolver, 'cache_query_plan', False):
+            return None
+
+    try:
+        return (
+            named_nodes_resolver,
+            tuple(subquery_resolvers),
+            resolver_context,
+            join_field,
+            freeze(build_options),
+            is_paging(kwargs),
+            freeze({arg: canonical_arg(arg, value) for arg, value in kwargs.items()
+                    if arg not in PAGING_ARGS and arg not in COUNT_ARGS})
+        )
+    except TypeError:
+        # unhashable kwargs: the plan is built but not cached.
+        return None
+
+
+def canonical_arg(arg, value):
+    # The order interfaces are listed in does not change the plan.
+    if arg in ('interfaces', 'interface') and isinstance(value, (list, tuple)):
+        return sorted(set(value))
+    return value
+
+
+def plan_cache_info():
+    return dict(
+        plans=plan_cache.info(),
+        compiled=compiled_cache.info()
+    )
+
+
+def clear_plan_cache():
+    plan_cache.clear()
+    compiled_cache.clear()
+
+
+def execute_query(connection, query, params=None, cached=False):
+    # Statements that are reused across requests (those of cached plans and the statements derived
+    # from them) are compiled once and looked up from the compiled cache thereafter. Others are left out
+    # of the compiled cache, where they would only displace the statements that are reused.
+    if cached:
+        connection = connection.execution_options(compiled_cache=compiled_cache)
+    if params is not None:
+        return connection.execute(query, params)
     else:
-        return []
+        return connection.execute(query)
+
+
+def planner_estimate(connection, statement, params=None):
+    """
+    The query planner's estimate of the number of rows statement returns, or None if the
+    dialect of the connection does not provide one. Only PostgreSQL is supported.
+    """
+    rows = explain(connection, statement, params, format='JSON')
+    if rows is None:
+        return None
+    plan = rows[0][0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
 
 
 def cte_join(named_nodes_resolver, subquery_resolvers, resolver_context, join_field='id', **kwargs):
-    named_nodes_selector = getattr(named_nodes_resolver, 'named_node_selector',
-                                     getattr(named_nodes_resolver, 'connection_nodes_selector',
-                                             getattr(named_nodes_resolver, 'selectable', None)))
+    return cte_join_plan(named_nodes_resolver, subquery_resolvers, resolver_context, join_field, **kwargs).query
+
+
+def cte_join_plan(named_nodes_resolver, subquery_resolvers, resolver_context, join_field='id', batch_keys=False,
+                  page_nodes=False, fields=None, batch_parents=False, **kwargs):
+    build_options = dict(batch_keys=batch_keys, page_nodes=page_nodes, fields=fields, batch_parents=batch_parents)
+    key = plan_cache_key(named_nodes_resolver, subquery_resolvers, resolver_context, join_field, build_options,
+                         **kwargs)
+
+    def build_plan(cached=False):
+        with instrument(BUILD, resolver_context) as event:
+            plan = build_cte_join(named_nodes_resolver, subquery_resolvers, resolver_context, join_field,
+                                  **build_options, **kwargs)
+            event.statement = plan.query
+        plan.cached = cached
+        return plan
+
+    if key is None:
+        return build_plan()
+
+    return plan_cache.get_or_create(key, lambda: build_plan(cached=True))
+
+
+def is_projected(field, fields, join_field):
+    # The named node key and the join field are always selected: instances are keyed
+    # by them and joins depend on them.
+    return fields is None or field in fields or field in (join_field, 'key')
+
+
+def project_columns(columns, fields, join_field):
+    return [column for column in columns if is_projected(column.key, fields, join_field)]
+
+
+def can_page_nodes(named_nodes_resolver, subquery_resolvers, **kwargs):
+    # The named node set can only be paged ahead of the interface joins if the page boundaries
+    # are determined by the named nodes alone.
+    return 'apply_distinct' not in kwargs and not (
+        is_paging(kwargs) and any(getattr(resolver, 'sort_order', None) for resolver in subquery_resolvers)
+    )
+
+
+def build_cte_join(named_nodes_resolver, subquery_resolvers, resolver_context, join_field='id', batch_keys=False,
+                   page_nodes=False, fields=None, batch_parents=False, **kwargs):
+    """
+    When page_nodes is requested, ordering and paging are applied to the named nodes before they
+    are passed on to the interface selectors, so the interface subqueries only see the nodes on the requested page.
+    The page is bound to the parameters _nodes_limit and _nodes_offset. If the page boundaries depend on
+    an interface sort_order, or the query is distinct, this falls back to the standard plan: the returned plan's
+    paged_nodes flag records which one was built.
+
+    When a set of fields is passed, only the columns for those fields are selected (projection pushdown).
+    The interface subqueries are still joined, so their sort orders continue to apply. Distinct queries are never
+    projected, since that would change which rows are distinct.
+
+    When batch_parents is requested, the plan selects the connection nodes of a batch of parents using the
+    batch_connection_nodes_selector of the resolver. The interface selectors are passed the distinct nodes
+    of the batch, and their results are joined back to the nodes of each parent. See
+    CteJoinPlan.partitioned_page_statement.
+    """
+    if batch_parents:
+        # Batched nested connections: the resolver provides a selector that returns the connection nodes of
+        # all the parents whose keys are in the expanding bind parameter 'parent_keys', along with the key of
+        # the parent of each node in the column parent_key
+        named_nodes_selector = getattr(named_nodes_resolver, 'batch_connection_nodes_selector', None)
+    elif batch_keys:
+        # Batched instance resolution: the resolver provides a selector that
+        # returns the named nodes whose keys are in the expanding bind parameter 'keys'
+        named_nodes_selector = getattr(named_nodes_resolver, 'batch_named_node_selector', None)
+    else:
+        named_nodes_selector = getattr(named_nodes_resolver, 'named_node_selector',
+                                       getattr(named_nodes_resolver, 'connection_nodes_selector',
+                                               getattr(named_nodes_resolver, 'selectable', None)))
     if named_nodes_selector is None:
         raise GraphQLImplementationError(
             f'Context: {resolver_context} Resolver: {named_nodes_resolver.__name__}: '
             f' Could not resolve named_nodes_selector'
         )
 
-    if len(subquery_resolvers) > 0:
+    paged_nodes = page_nodes and not batch_parents and \
+                  can_page_nodes(named_nodes_resolver, subquery_resolvers, **kwargs)
+    if batch_parents:
+        # A node may belong to more than one parent, so the interface selectors are passed the
+        # distinct nodes, which keeps aggregates in the interface selectors from being multiplied.
+        parent_nodes = named_nodes_selector(**kwargs).cte(f'{resolver_context}_parents')
+        named_nodes_query = select(
+            [column for column in parent_nodes.c if column.key != 'parent_key']
+        ).distinct().cte(resolver_context)
+    elif paged_nodes:
+        named_nodes = named_nodes_selector(**kwargs).alias(f'{resolver_context}_nodes')
+        named_nodes_query = select(named_nodes.c).order_by(
+            *node_sort_order(named_nodes_resolver, named_nodes, join_field, **kwargs)
+        ).limit(
+            bindparam('_nodes_limit')
+        ).offset(
+            bindparam('_nodes_offset')
+        ).cte(resolver_context)
+    elif len(subquery_resolvers) > 0:
         named_nodes_query = named_nodes_selector(**kwargs).cte(resolver_context)
     else:
         named_nodes_query = named_nodes_selector(**kwargs).alias(resolver_context)
 
+    # the relation that rows of the result are drawn from: one row per node, or per node and parent when batched.
+    nodes = parent_nodes if batch_parents else named_nodes_query
+
     subqueries = []
     sort_order = []
 
-    if hasattr(named_nodes_resolver, 'sort_order'):
-        sort_order.extend(named_nodes_resolver.sort_order(named_nodes_query, **kwargs))
+    if paged_nodes:
+        sort_order.extend(node_sort_order(named_nodes_resolver, named_nodes_query, join_field, **kwargs))
+    elif hasattr(named_nodes_resolver, 'sort_order'):
+        sort_order.extend(named_nodes_resolver.sort_order(nodes, **kwargs))
 
     for resolver in subquery_resolvers:
         interface_selector = getattr(resolver, 'interface_selector', getattr(resolver, 'selectable', None))
@@ -141,29 +552,33 @@ def cte_join(named_nodes_resolver, subquery_resolvers, resolver_context, join_fi
 
     # Add all the columns from the named node CTE
     for col in get_named_node_resolver_interface_fields(named_nodes_resolver):
-        if col in named_nodes_query.columns:
+        if col in nodes.columns:
             seen_columns.add(col)
-            output_columns.append(named_nodes_query.c[col])
+            output_columns.append(nodes.c[col])
         else:
             raise GraphQLImplementationError(f"Named node selector query for {named_nodes_resolver}  does not return an expected column named  {col}")
 
     # Add the columns from the subqueries based on the interfaces they expose
     for interface, selectable in subqueries:
-        for field in properties(interface):
+        metadata = interface_fields(interface)
+        for field in metadata.fields:
             if field not in seen_columns:
                 if field in selectable.c:
                     seen_columns.add(field)
                     output_columns.append(selectable.c[field])
                 else:
-                    if is_required(field, interface):
+                    if field in metadata.required:
                         raise GraphQLImplementationError(
                             f'Context: {resolver_context} Resolver: {resolver.__name__}: '
                             f' Selectable query for interface {interface} does not define a value for column {field}'
                         )
 
-    joined = named_nodes_query
+    if 'apply_distinct' not in kwargs:
+        output_columns = project_columns(output_columns, fields, join_field)
+
+    joined = nodes
     for _, selectable in subqueries:
-        joined = joined.outerjoin(selectable, named_nodes_query.c[join_field] == selectable.c[join_field])
+        joined = joined.outerjoin(selectable, nodes.c[join_field] == selectable.c[join_field])
     # Select the output columns from the resulting join
     query = select(output_columns).select_from(joined)
 
@@ -177,27 +592,274 @@ def cte_join(named_nodes_resolver, subquery_resolvers, resolver_context, join_fi
     if len(sort_order) > 0:
         query = query.order_by(*sort_order)
 
-    return query
+    return CteJoinPlan(query, nodes, subqueries, output_columns, joined, sort_order, join_field,
+                       distinct='apply_distinct' in kwargs, paged_nodes=paged_nodes, batch_parents=batch_parents)
+
+
+def node_sort_order(named_nodes_resolver, named_nodes, join_field, **kwargs):
+    # the join field is added as a tie breaker so that the order of the
+    # named nodes, and therefore the page boundaries, are deterministic.
+    sort_order = []
+    if hasattr(named_nodes_resolver, 'sort_order'):
+        sort_order.extend(named_nodes_resolver.sort_order(named_nodes, **kwargs))
+    sort_order.append(named_nodes.c[join_field])
+    return sort_order
+
+
+class SplitJoinPlan:
+    """
+    An alternative to the single statement cte_join: the named nodes are selected by one query, and each
+    interface selector runs as a query of its own against the ids of those nodes (bound to
+    the expanding parameter _node_ids). The results are merged by join field in memory.
+    Every node id is bound into each interface query, so plans that do not page the nodes are only
+    suitable for small connections.
+    """
+
+    def __init__(self, nodes_query, interface_queries, column_names, join_field='id', paged_nodes=False):
+        self.nodes_query = nodes_query
+        self.interface_queries = interface_queries
+        self.column_names = column_names
+        self.join_field = join_field
+        self.paged_nodes = paged_nodes
+        self.cached = False
+
+
+def split_join_plan(named_nodes_resolver, subquery_resolvers, resolver_context, join_field='id', page_nodes=False,
+                    fields=None, **kwargs):
+    build_options = dict(page_nodes=page_nodes, fields=fields)
+    key = plan_cache_key(named_nodes_resolver, subquery_resolvers, resolver_context, join_field, build_options,
+                         **kwargs)
+    if key is None:
+        return build_split_join(named_nodes_resolver, subquery_resolvers, resolver_context, join_field,
+                                **build_options, **kwargs)
+
+    def build_plan():
+        plan = build_split_join(named_nodes_resolver, subquery_resolvers, resolver_context, join_field,
+                                **build_options, **kwargs)
+        plan.cached = True
+        return plan
+
+    return plan_cache.get_or_create((SplitJoinPlan, key), build_plan)
+
+
+def can_split_join(named_nodes_resolver, subquery_resolvers, **kwargs):
+    # The order of the rows must be determined by the named nodes alone, since
+    # the interface queries are merged into the named node rows after the fact.
+    return len(subquery_resolvers) > 0 and can_page_nodes(named_nodes_resolver, subquery_resolvers, **kwargs)
+
+
+def build_split_join(named_nodes_resolver, subquery_resolvers, resolver_context, join_field='id', page_nodes=False,
+                     fields=None, **kwargs):
+    named_nodes_selector = getattr(named_nodes_resolver, 'named_node_selector',
+                                   getattr(named_nodes_resolver, 'connection_nodes_selector',
+                                           getattr(named_nodes_resolver, 'selectable', None)))
+    if named_nodes_selector is None:
+        raise GraphQLImplementationError(
+            f'Context: {resolver_context} Resolver: {named_nodes_resolver.__name__}: '
+            f' Could not resolve named_nodes_selector'
+        )
+
+    named_nodes = named_nodes_selector(**kwargs).alias(f'{resolver_context}_nodes')
+    seen_columns = set()
+    column_names = []
+    for col in get_named_node_resolver_interface_fields(named_nodes_resolver):
+        if col in named_nodes.columns:
+            seen_columns.add(col)
+            if is_projected(col, fields, join_field):
+                column_names.append(col)
+        else:
+            raise GraphQLImplementationError(f"Named node selector query for {named_nodes_resolver}  does not return an expected column named  {col}")
+
+    nodes_query = select(
+        [named_nodes.c[col] for col in column_names] +
+        ([named_nodes.c[join_field]] if join_field not in column_names else [])
+    ).order_by(
+        *node_sort_order(named_nodes_resolver, named_nodes, join_field, **kwargs)
+    )
+    if page_nodes:
+        nodes_query = nodes_query.limit(bindparam('_nodes_limit')).offset(bindparam('_nodes_offset'))
+
+    # The interface selectors are passed the named nodes restricted to the ones returned by nodes_query.
+    node_set = select(named_nodes.c).where(
+        named_nodes.c[join_field].in_(bindparam('_node_ids', expanding=True))
+    ).cte(resolver_context)
+
+    interface_queries = []
+    for resolver in subquery_resolvers:
+        interface_selector = getattr(resolver, 'interface_selector', getattr(resolver, 'selectable', None))
+        if interface_selector is None:
+            raise GraphQLImplementationError(
+                f'Context: {resolver_context} Resolver: {resolver.__name__}: '
+                f' Could not resolve interface_selector'
+            )
+        try:
+            selectable = interface_selector(node_set, **kwargs).alias(resolver.interface.__name__)
+        except Exception as exc:
+            raise GraphQLImplementationError(f"GraphQLImplementationError resolving interface {resolver.interface}: {str(exc)}")
+
+        metadata = interface_fields(resolver.interface)
+        columns = []
+        for field in metadata.fields:
+            if field not in seen_columns:
+                if field in selectable.c:
+                    seen_columns.add(field)
+                    if is_projected(field, fields, join_field):
+                        column_names.append(field)
+                        columns.append(selectable.c[field])
+                elif field in metadata.required:
+                    raise GraphQLImplementationError(
+                        f'Context: {resolver_context} Resolver: {resolver.__name__}: '
+                        f' Selectable query for interface {resolver.interface} does not define a value for column {field}'
+                    )
+        # interfaces none of whose columns are projected are not queried at all.
+        if len(columns) > 0:
+            interface_queries.append(
+                (resolver.interface, select([selectable.c[join_field].label('_join_field')] + columns))
+            )
+
+    return SplitJoinPlan(nodes_query, interface_queries, column_names, join_field, paged_nodes=page_nodes)
+
+
+SPLIT_JOIN_WORKERS = 4
+split_join_executor = None
+split_join_executor_lock = Lock()
+
+
+def get_split_join_executor():
+    global split_join_executor
+    with split_join_executor_lock:
+        if split_join_executor is None:
+            split_join_executor = ThreadPoolExecutor(
+                max_workers=SPLIT_JOIN_WORKERS,
+                thread_name_prefix='polaris-graphql-split-join'
+            )
+        return split_join_executor
+
+
+def execute_interface_query(statement, params, cached=False):
+    # Each interface query runs on its own pooled connection.
+    with db.create_session() as session:
+        return execute_query(session.connection, statement, params, cached).fetchall()
+
+
+def resolve_split_join(plan, params=None, page_params=None, join_session=None):
+    """
+    Execute a SplitJoinPlan and return the merged rows as dicts keyed by the plan's column names,
+    in the order of the named nodes. Interface rows are merged in with a hash join on the join field:
+    nodes without a matching interface row get None for that interface's columns as they
+    would from the outer join in cte_join.
+    """
+    params = params or {}
+    with create_session(join_session) as session:
+        node_rows = execute_query(
+            session.connection,
+            plan.nodes_query,
+            {**params, **(page_params or {})},
+            plan.cached
+        ).fetchall()
+
+    if len(node_rows) == 0:
+        return []
+
+    instance_hash = {}
+    for row in node_rows:
+        instance = {column: None for column in plan.column_names}
+        for key, value in row.items():
+            instance[key] = value
+        instance_hash[row[plan.join_field]] = instance
+
+    if len(plan.interface_queries) > 0:
+        executor = get_split_join_executor()
+        interface_params = {**params, '_node_ids': list(instance_hash.keys())}
+        futures = [
+            executor.submit(execute_interface_query, statement, interface_params, plan.cached)
+            for _, statement in plan.interface_queries
+        ]
+        for future in futures:
+            for row in future.result():
+                instance = instance_hash.get(row['_join_field'])
+                if instance is not None:
+                    for key, value in row.items():
+                        if key != '_join_field':
+                            instance[key] = value
+
+    return [
+        {column: instance[column] for column in plan.column_names}
+        for instance in instance_hash.values()
+    ]
 
 
 def resolve_join(named_node_resolver, interface_resolvers, resolver_context, params, output_type=None, join_field='id',
                  **kwargs):
-    with db.orm_session() as session:
-        query = cte_join(named_node_resolver, interface_resolvers, resolver_context, join_field, **kwargs)
-        result = session.connection().execute(query, params).fetchall()
-        return [
-            output_type(**{key: value for key, value in row.items()})
-            for row in result
-        ] if output_type else result
+    with create_session() as session:
+        plan = cte_join_plan(named_node_resolver, interface_resolvers, resolver_context, join_field, **kwargs)
+        with instrument(EXECUTE, resolver_context, 'join', plan.query, params,
+                        [resolver.interface.__name__ for resolver in interface_resolvers]) as event:
+            event.dialect = session.connection.dialect
+            result = execute_query(session.connection, plan.query, params, plan.cached).fetchall()
+            event.rows = len(result)
+        return to_objects(output_type, result) if output_type else result
+
+
+async def resolve_join_async(named_node_resolver, interface_resolvers, resolver_context, params, output_type=None,
+                             join_field='id', **kwargs):
+    return await run_in_thread(resolve_join, named_node_resolver, interface_resolvers, resolver_context, params,
+                               output_type, join_field, **kwargs)
+
+
+def resolve_instances(named_node_resolver, interface_resolvers, resolver_context, keys, params, output_type=None,
+                      **kwargs):
+    """
+    Batched form of resolve_instance: resolves all the instances for the given keys
+    in a single query and returns a dict mapping each key to its instance. As with resolve_instance,
+    a key that does not resolve to exactly one row maps to None. Keys are
+    normalized to strings since key columns are typically UUIDs.
+    """
+    resolvers = collect_join_resolvers(interface_resolvers, **kwargs)
+    rows = resolve_join(named_node_resolver, resolvers, resolver_context, params, batch_keys=True, **kwargs)
+
+    instances = dict()
+    for row in rows:
+        key = str(row['key'])
+        instances[key] = None if key in instances else row
+
+    keys = [key for key, row in instances.items() if row is not None]
+    rows = [instances[key] for key in keys]
+    return dict(zip(keys, to_objects(output_type, rows) if output_type else rows))
 
 
 def collect_join_resolvers(interface_resolvers, **kwargs):
-    interfaces = [interface
-                  for interface in set(kwargs.get('interfaces', [])) | set(kwargs.get('interface', []))]
+    # Sorted, so that the same set of interfaces always produces the same joins in the same
+    # order, and so the same SQL text, whatever order they were requested in.
+    interfaces = sorted(set(kwargs.get('interfaces', [])) | set(kwargs.get('interface', [])))
     return [interface_resolvers.get(interface) for interface in interfaces if
             interface_resolvers.get(interface) is not None]
 
 
+def select_interfaces(named_node_resolver, interface_resolvers, fields, **kwargs):
+    """
+    The names of the interfaces that need to be joined to provide the given fields. If the client listed
+    interfaces, the choice is restricted to those, otherwise any interface with a resolver may be chosen.
+    Listed interfaces are always kept if they contribute to the sort order of a paged query, and all listed
+    interfaces are kept when summaries are requested, since summarizers may read any of their columns:
+    the result is then the listed interfaces followed by any others the selection needs.
+    """
+    listed = [interface for interface in kwargs.get('interfaces') or [] if interface in interface_resolvers]
+    needed = fields - set(get_named_node_resolver_interface_fields(named_node_resolver))
+    selected = [
+        interface
+        for interface, resolver in interface_resolvers.items()
+        if (interface in listed or not listed) and (
+            interface_fields(resolver.interface).field_set & needed or (
+                interface in listed and is_paging(kwargs) and getattr(resolver, 'sort_order', None)
+            )
+        )
+    ]
+    if 'summaries' in kwargs:
+        return listed + [interface for interface in selected if interface not in listed]
+    return selected
+
+
 def resolve_collection(named_node_resolver, interface_resolvers, resolver_context, params, **kwargs):
     resolvers = collect_join_resolvers(interface_resolvers, **kwargs)
     return resolve_join(named_node_resolver, resolvers, resolver_context, params, **kwargs)
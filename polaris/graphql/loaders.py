@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+
+# Copyright: © Exathink, LLC (2011-2018) All Rights Reserved
+
+# Unauthorized use or copying of this file and its contents, via any medium
+# is strictly prohibited. The work product in this file is proprietary and
+# confidential.
+
+# Author: Krishna Kumar
+
+from promise import Promise
+from promise.dataloader import DataLoader
+
+from .instrumentation import instrument, EXECUTE
+from .join_utils import resolve_instances, cte_join_plan, execute_query
+from .records import to_objects
+from .session_utils import create_session
+from .utils import freeze
+
+
+def request_loaders(context):
+    """
+    Returns the dict of loaders scoped to the current request. Loaders are kept on the
+    graphql execution context, so they live exactly as long as the request does.
+    Returns None if there is no context to attach them to.
+    """
+    if context is None:
+        return None
+
+    if isinstance(context, dict):
+        return context.setdefault('polaris_loaders', dict())
+
+    loaders = getattr(context, 'polaris_loaders', None)
+    if loaders is None:
+        loaders = dict()
+        setattr(context, 'polaris_loaders', loaders)
+    return loaders
+
+
+def get_loader(info, loader_key, factory):
+    loaders = request_loaders(info.context)
+    if loaders is None:
+        return None
+
+    loader = loaders.get(loader_key)
+    if loader is None:
+        loader = factory()
+        loaders[loader_key] = loader
+    return loader
+
+
+class InstanceLoader(DataLoader):
+    """
+    Collects the keys of the instances of a Selectable that are requested within an
+    execution tick and resolves them with a single cte_join query using the
+    batch_named_node_selector of the Selectable's named node resolver.
+    """
+
+    def __init__(self, selectable, **kwargs):
+        super().__init__()
+        self.selectable = selectable
+        self.kwargs = kwargs
+
+    def batch_load_fn(self, keys):
+        selectable = self.selectable
+        instances = resolve_instances(
+            selectable.named_node_resolver(),
+            selectable.interface_resolvers(),
+            resolver_context=selectable.__name__,
+            keys=keys,
+            params=selectable.keys_to_instance_resolver_params(keys),
+            output_type=selectable,
+            **self.kwargs
+        )
+        return Promise.resolve([instances.get(str(key)) for key in keys])
+
+
+def get_instance_loader(selectable, info, **kwargs):
+    if not hasattr(selectable.named_node_resolver(), 'batch_named_node_selector'):
+        return None
+
+    try:
+        loader_key = (InstanceLoader, selectable, freeze(kwargs))
+    except TypeError:
+        return None
+
+    return get_loader(info, loader_key, lambda: InstanceLoader(selectable, **kwargs))
+
+
+class ConnectionPage:
+    """
+    The page of the connection of one parent resolved by a ConnectionLoader, along with
+    the total number of nodes in that parent's connection.
+    """
+
+    def __init__(self, nodes, total_count):
+        self.nodes = nodes
+        self.total_count = total_count
+
+
+class ConnectionLoader(DataLoader):
+    """
+    Collects the parent keys of the nested connections that share a connection resolver and
+    arguments within an execution tick, and resolves the same page of each parent's connection
+    with a single query partitioned by parent.
+    """
+
+    def __init__(self, connection_resolver_query, limit, offset):
+        super().__init__()
+        self.connection_resolver_query = connection_resolver_query
+        self.limit = limit
+        self.offset = offset
+
+    def batch_load_fn(self, parent_keys):
+        query = self.connection_resolver_query
+        plan = cte_join_plan(query.connection_resolver, query.join_resolvers, query.resolver_context,
+                             batch_parents=True, fields=query.fields, **query.kwargs)
+        params = {
+            **(query.batch_params or {}),
+            **plan.partition_params(self.limit, self.offset),
+            'parent_keys': list(parent_keys)
+        }
+        statement = plan.partitioned_page_statement()
+        with instrument(EXECUTE, query.resolver_context, 'batched', statement, params,
+                        query.interface_names) as event, \
+                create_session() as session:
+            event.dialect = session.connection.dialect
+            rows = execute_query(session.connection, statement, params, plan.cached).fetchall()
+            event.rows = len(rows)
+
+        partitions = dict()
+        for row in rows:
+            partitions.setdefault(str(row['parent_key']), []).append(row)
+
+        pages = []
+        offset = self.offset or 0
+        for parent_key in parent_keys:
+            partition = partitions.get(str(parent_key))
+            if partition is not None:
+                total_count = partition[0]['_total_count']
+                partition = [row for row in partition if row['_row_number'] > offset]
+                nodes = to_objects(query.output_type, partition, plan.column_names) if query.output_type \
+                    else partition
+                pages.append(ConnectionPage(nodes, total_count))
+            else:
+                pages.append(ConnectionPage([], 0))
+
+        return Promise.resolve(pages)
+
+
+def get_connection_loader(connection_resolver_query, info, limit, offset):
+    query = connection_resolver_query
+    try:
+        loader_key = (
+            ConnectionLoader, query.connection_resolver, tuple(query.join_resolvers), query.resolver_context,
+            query.output_type, freeze(query.batch_params), freeze(query.kwargs), freeze(query.fields), limit, offset
+        )
+    except TypeError:
+        return None
+
+    return get_loader(info, loader_key, lambda: ConnectionLoader(query, limit, offset))
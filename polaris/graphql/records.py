@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+
+# Copyright: © Exathink, LLC (2011-2018) All Rights Reserved
+
+# Unauthorized use or copying of this file and its contents, via any medium
+# is strictly prohibited. The work product in this file is proprietary and
+# confidential.
+
+# Author: Krishna Kumar
+
+from collections import namedtuple
+from types import FunctionType, MethodType
+from threading import Lock
+
+
+# Record classes are generated once per (output type, columns) combination.
+record_classes = dict()
+record_classes_lock = Lock()
+
+
+def record_getattr(self, name):
+    # Only called for attributes that are not columns of the record.
+    # Fields of the output type that were not selected resolve to None, as they would
+    # on an instance of the output type, and methods of the output type are bound to the record,
+    # so the resolvers of the output type can be used with records in place of instances.
+    output_type = type(self).output_type
+    if name in output_type._meta.fields:
+        return None
+
+    attribute = getattr(output_type, name)
+    if isinstance(attribute, FunctionType):
+        return MethodType(attribute, self)
+    return attribute
+
+
+def record_class(output_type, columns):
+    key = (output_type, columns)
+    clazz = record_classes.get(key)
+    if clazz is None:
+        with record_classes_lock:
+            clazz = record_classes.get(key)
+            if clazz is None:
+                base = namedtuple(f'{output_type.__name__}Record', columns)
+                clazz = type(base.__name__, (base,), dict(
+                    __slots__=(),
+                    output_type=output_type,
+                    __getattr__=record_getattr
+                ))
+                record_classes[key] = clazz
+    return clazz
+
+
+def record_is_type_of(cls, root, info):
+    return isinstance(root, cls) or getattr(type(root), 'output_type', None) is cls
+
+
+def use_records(output_type):
+    meta = getattr(output_type, '_meta', None)
+    return getattr(meta, 'record_materialization', False)
+
+
+def row_values(row):
+    return row.values() if isinstance(row, dict) else row
+
+
+def row_value(row, column):
+    # Dict rows merged from several result sets may be missing columns.
+    return row.get(column) if isinstance(row, dict) else row[column]
+
+
+def to_objects(output_type, rows, columns=None):
+    """
+    Materialize result rows (result proxy rows or dicts) as instances of output_type, or as
+    lightweight tuple backed records standing in for them when the output type uses record materialization.
+    If columns is given, only those columns of the rows are used, and columns missing from dict rows are None.
+    """
+    if rows is None or len(rows) == 0:
+        return []
+
+    if use_records(output_type):
+        if columns is None:
+            columns = tuple(rows[0].keys())
+            make = record_class(output_type, columns)._make
+            return [make(row_values(row)) for row in rows]
+        else:
+            make = record_class(output_type, tuple(columns))._make
+            return [make(row_value(row, column) for column in columns) for row in rows]
+
+    if columns is None:
+        return [output_type(**{key: value for key, value in row.items()}) for row in rows]
+    else:
+        return [output_type(**{column: row_value(row, column) for column in columns}) for row in rows]
+
+
+def iter_objects(output_type, result, batch_size):
+    """
+    Generator over the objects for the rows of an open result, fetching and materializing
+    batch_size rows at a time. Rows are yielded as is when output_type is None.
+    """
+    while True:
+        rows = result.fetchmany(batch_size)
+        if len(rows) == 0:
+            break
+        yield from to_objects(output_type, rows) if output_type else rows
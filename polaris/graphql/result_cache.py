@@ -0,0 +1,407 @@
+# -*- coding: utf-8 -*-
+
+# Copyright: © Exathink, LLC (2011-2018) All Rights Reserved
+
+# Unauthorized use or copying of this file and its contents, via any medium
+# is strictly prohibited. The work product in this file is proprietary and
+# confidential.
+
+# Author: Krishna Kumar
+
+import hashlib
+import logging
+import pickle
+import sys
+import time
+from collections import defaultdict
+from threading import RLock
+
+from .cache_utils import LRUCache
+
+logger = logging.getLogger('polaris.graphql.result_cache')
+
+
+# The statements of cached plans are shared across requests, so their compiled forms are memoized too.
+# The dialect is the same for every connection of the process, so it is not part of the key.
+compiled_statements = LRUCache(maxsize=1024)
+
+
+def result_cache_key(statement, params=None, dialect=None, memoize=True):
+    """
+    The cache key of the result of executing statement with params: a digest of the
+    SQL text of the statement, as compiled for dialect, and the bound parameter values. Values bound
+    in the statement itself (such as those of limit and offset) are part of the compiled parameters.
+    The compiled statement is only memoized if memoize is set: statements built per request are
+    never seen again, and would only pin memory in the memo.
+    """
+    if memoize:
+        sql, statement_params = compiled_statements.get_or_create(
+            statement, lambda: compile_statement(statement, dialect)
+        )
+    else:
+        sql, statement_params = compile_statement(statement, dialect)
+    bound = repr(sorted({**statement_params, **(params or {})}.items()))
+    return hashlib.sha1(f'{sql}\x00{bound}'.encode('utf-8')).hexdigest()
+
+
+def compile_statement(statement, dialect):
+    compiled = statement.compile(dialect=dialect)
+    return str(compiled), compiled.params
+
+
+def result_tags(resolver_context, rows=None):
+    # A cached result can be invalidated by the context of the resolver that produced
+    # it, or by the key of any entity it contains. Results that are not rows (counts, summaries)
+    # depend on every entity of the context, so they are tagged as its aggregates, which are
+    # invalidated along with any result of the context invalidated by entity key.
+    tags = {f'context:{resolver_context}'}
+    if rows is None:
+        tags.add(f'aggregate:{resolver_context}')
+    elif rows and 'key' in rows[0].keys():
+        tags.update(f'key:{row["key"]}' for row in rows)
+    return tags
+
+
+def aggregate_tags(tags):
+    # The aggregate tags of the contexts among tags.
+    return {f'aggregate:{tag[len("context:"):]}' for tag in tags if tag.startswith('context:')}
+
+
+class CachedRow(tuple):
+    """
+    A row restored from the cache. Like the rows of a result proxy, its values can be read
+    by index, by column name as a key and as attributes.
+    """
+    __slots__ = ()
+    columns = ()
+    indexes = {}
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return tuple.__getitem__(self, self.indexes[key])
+        return tuple.__getitem__(self, key)
+
+    def __getattr__(self, name):
+        index = type(self).indexes.get(name)
+        if index is None:
+            raise AttributeError(name)
+        return tuple.__getitem__(self, index)
+
+    def has_key(self, key):
+        return key in self.indexes
+
+    def keys(self):
+        return list(self.columns)
+
+    def values(self):
+        return list(self)
+
+    def items(self):
+        return list(zip(self.columns, self))
+
+
+# Row classes are generated once per set of columns.
+cached_row_classes = dict()
+cached_row_classes_lock = RLock()
+
+
+def cached_row_class(columns):
+    clazz = cached_row_classes.get(columns)
+    if clazz is None:
+        with cached_row_classes_lock:
+            clazz = cached_row_classes.get(columns)
+            if clazz is None:
+                clazz = type('CachedRow', (CachedRow,), dict(
+                    __slots__=(),
+                    columns=columns,
+                    indexes={column: index for index, column in enumerate(columns)}
+                ))
+                cached_row_classes[columns] = clazz
+    return clazz
+
+
+def pack_rows(rows):
+    # Rows are cached as plain tuples, and restored as CachedRows so that
+    # hits return rows that can be used the same way as the rows of misses.
+    if len(rows) == 0:
+        return (), []
+    return tuple(rows[0].keys()), [tuple(row) for row in rows]
+
+
+def unpack_rows(packed):
+    columns, values = packed
+    clazz = cached_row_class(columns)
+    return [clazz(row) for row in values]
+
+
+def estimated_size(value):
+    if isinstance(value, tuple) and len(value) == 2 and isinstance(value[1], list):
+        columns, values = value
+        return sys.getsizeof(values) + sum(
+            sys.getsizeof(row) + sum(sys.getsizeof(item) for item in row) for row in values
+        )
+    return sys.getsizeof(value)
+
+
+class CacheEntry:
+    __slots__ = ('value', 'expires', 'tags', 'size')
+
+    def __init__(self, value, expires, tags, size):
+        self.value = value
+        self.expires = expires
+        self.tags = tags
+        self.size = size
+
+
+class LocalResultCache:
+    """
+    In process result cache: a bounded LRU of results with a time to live per entry,
+    and an index from tags to the entries that carry them for invalidation.
+    """
+
+    def __init__(self, maxsize=256):
+        self.lock = RLock()
+        self.entries = LRUCache(maxsize, on_evict=self.forget)
+        self.tags = defaultdict(set)
+        self.memory = 0
+        self.hits = 0
+        self.misses = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def forget(self, key, entry):
+        with self.lock:
+            self.memory -= entry.size
+            for tag in entry.tags:
+                keys = self.tags.get(tag)
+                if keys is not None:
+                    keys.discard(key)
+                    if len(keys) == 0:
+                        del self.tags[tag]
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry.expires < time.monotonic():
+                self.entries.pop(key)
+                self.forget(key, entry)
+                self.expirations += 1
+                entry = None
+
+            if entry is not None:
+                self.hits += 1
+                return entry.value
+            self.misses += 1
+
+    def set(self, key, value, ttl, tags=()):
+        with self.lock:
+            existing = self.entries.pop(key)
+            if existing is not None:
+                self.forget(key, existing)
+            entry = CacheEntry(value, time.monotonic() + ttl, frozenset(tags), estimated_size(value))
+            self.memory += entry.size
+            for tag in entry.tags:
+                self.tags[tag].add(key)
+            self.entries[key] = entry
+
+    def invalidate(self, tags, cascade=False):
+        # cascade: also invalidate the aggregates of the contexts of the invalidated results.
+        with self.lock:
+            keys = set()
+            for tag in tags:
+                keys.update(self.tags.get(tag, ()))
+            if cascade:
+                for tag in aggregate_tags({tag for key in keys for tag in self.entries.get(key).tags}):
+                    keys.update(self.tags.get(tag, ()))
+            for key in keys:
+                entry = self.entries.pop(key)
+                if entry is not None:
+                    self.forget(key, entry)
+                    self.invalidations += 1
+            return len(keys)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.tags.clear()
+            self.memory = 0
+            self.hits = 0
+            self.misses = 0
+            self.expirations = 0
+            self.invalidations = 0
+
+    def info(self):
+        with self.lock:
+            return dict(
+                hits=self.hits,
+                misses=self.misses,
+                evictions=self.entries.evictions,
+                expirations=self.expirations,
+                invalidations=self.invalidations,
+                size=len(self.entries),
+                maxsize=self.entries.maxsize,
+                memory=self.memory
+            )
+
+
+class RedisResultCache:
+    """
+    Result cache backed by a Redis compatible server, so that cached results are shared
+    by worker processes. Requires the redis package. Errors talking to the server
+    are logged and treated as cache misses, so the cache never fails a request.
+    """
+
+    def __init__(self, url='redis://localhost:6379/0', prefix='polaris:graphql:results:'):
+        try:
+            import redis
+        except ImportError:
+            raise ImportError('The redis package is required to use the RedisResultCache')
+
+        self.client = redis.Redis.from_url(url)
+        self.errors = redis.RedisError
+        self.prefix = prefix
+        self.lock = RLock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def count(self, hit):
+        with self.lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get(self, key):
+        try:
+            data = self.client.get(f'{self.prefix}{key}')
+        except self.errors as exc:
+            logger.warning(f'Result cache get failed: {exc}')
+            data = None
+
+        self.count(data is not None)
+        return pickle.loads(data) if data is not None else None
+
+    def set(self, key, value, ttl, tags=()):
+        try:
+            pipeline = self.client.pipeline()
+            pipeline.setex(f'{self.prefix}{key}', int(max(ttl, 1)), pickle.dumps(value))
+            if tags:
+                # the tags of the entry, for cascading invalidations.
+                pipeline.sadd(f'{self.prefix}tags:{key}', *tags)
+                pipeline.expire(f'{self.prefix}tags:{key}', int(max(ttl, 1)))
+            for tag in tags:
+                # tag sets are expired along with the entries they index.
+                pipeline.sadd(f'{self.prefix}tag:{tag}', key)
+                pipeline.expire(f'{self.prefix}tag:{tag}', int(max(ttl, 1)))
+            pipeline.execute()
+        except self.errors as exc:
+            logger.warning(f'Result cache set failed: {exc}')
+
+    def invalidate(self, tags, cascade=False):
+        # cascade: also invalidate the aggregates of the contexts of the invalidated results.
+        try:
+            keys = self.tagged(tags)
+            if cascade:
+                tags = [*tags, *aggregate_tags({
+                    tag.decode('utf-8') for key in keys for tag in self.client.smembers(f'{self.prefix}tags:{key}')
+                })]
+                keys = self.tagged(tags)
+            pipeline = self.client.pipeline()
+            for key in keys:
+                pipeline.delete(f'{self.prefix}{key}')
+                pipeline.delete(f'{self.prefix}tags:{key}')
+            for tag in tags:
+                pipeline.delete(f'{self.prefix}tag:{tag}')
+            pipeline.execute()
+        except self.errors as exc:
+            logger.warning(f'Result cache invalidation failed: {exc}')
+            return 0
+
+        with self.lock:
+            self.invalidations += len(keys)
+        return len(keys)
+
+    def tagged(self, tags):
+        return {
+            key.decode('utf-8') for tag in tags for key in self.client.smembers(f'{self.prefix}tag:{tag}')
+        }
+
+    def clear(self):
+        try:
+            keys = list(self.client.scan_iter(match=f'{self.prefix}*'))
+            if len(keys) > 0:
+                self.client.delete(*keys)
+        except self.errors as exc:
+            logger.warning(f'Result cache clear failed: {exc}')
+        with self.lock:
+            self.hits = 0
+            self.misses = 0
+            self.invalidations = 0
+
+    def info(self):
+        try:
+            memory = self.client.info('memory').get('used_memory')
+        except self.errors:
+            memory = None
+        with self.lock:
+            return dict(
+                hits=self.hits,
+                misses=self.misses,
+                invalidations=self.invalidations,
+                memory=memory
+            )
+
+
+# The active result cache backend. Replaced via set_result_cache.
+result_cache = LocalResultCache()
+
+
+def set_result_cache(backend):
+    global result_cache
+    result_cache = backend
+
+
+def get_result_cache():
+    return result_cache
+
+
+def cached_result(resolver_context, ttl, statement, params, fetch, rows=True, dialect=None, memoize=True):
+    """
+    Return the cached result for statement and params if there is one, otherwise
+    call fetch and cache what it returns for ttl seconds. rows indicates whether the
+    result is a list of rows or a scalar. dialect is that of the connection the statement is executed on,
+    and memoize whether the statement is shared across requests (see result_cache_key).
+    """
+    key = result_cache_key(statement, params, dialect, memoize)
+    cached = result_cache.get(key)
+    if cached is not None:
+        return unpack_rows(cached) if rows else cached
+
+    result = fetch()
+    if result is not None:
+        result_cache.set(
+            key,
+            pack_rows(result) if rows else result,
+            ttl,
+            result_tags(resolver_context, result if rows else None)
+        )
+    return result
+
+
+def invalidate_results(resolver_context=None, entity_key=None):
+    """
+    Invalidate the cached results of connections with the given resolver context,
+    and/or those that contain the entity with the given key, along with the counts and summaries
+    of the connections they belong to. Returns the number of results invalidated.
+    """
+    tags = []
+    if resolver_context is not None:
+        tags.append(f'context:{resolver_context}')
+    if entity_key is not None:
+        tags.append(f'key:{entity_key}')
+    return result_cache.invalidate(tags, cascade=entity_key is not None) if tags else 0
+
+
+def result_cache_info():
+    return result_cache.info()
@@ -8,9 +8,15 @@
 
 # Author: Krishna Kumar
 
-from .join_utils import resolve_instance
+from contextvars import ContextVar
+from functools import partial
+
+from .join_utils import resolve_instance, select_interfaces
 from .connection_utils import ConnectionResolverQuery, QueryConnectionField, CountableConnection
-from polaris.common import db
+from .utils import register_interface, run_in_thread, selected_fields
+from .records import record_is_type_of
+from .loaders import get_instance_loader
+from .session_utils import create_session
 
 import graphene
 from graphene.types.objecttype import ObjectType, ObjectTypeOptions
@@ -22,6 +28,36 @@ class SelectableObjectOptions(ObjectTypeOptions):
     connection_node_resolvers = None
     interface_enum = None
     connection_class = None
+    projection_pushdown = False
+    auto_interfaces = False
+    record_materialization = False
+    result_cache_ttl = None
+
+
+# The (Selectable, fields) selected by the Selectable field that is currently being resolved.
+current_selection = ContextVar('current_selection', default=None)
+
+
+class SelectableField(graphene.Field):
+    """
+    A field whose resolver is run with the set of fields selected on the Selectable available via
+    current_selection, so that resolve_instance can push the projection down into the query.
+    """
+
+    def get_resolver(self, parent_resolver):
+        resolver = super().get_resolver(parent_resolver)
+        if self.type._meta.projection_pushdown or self.type._meta.auto_interfaces:
+            return partial(self.resolve_with_selection, resolver, self.type)
+        return resolver
+
+    @staticmethod
+    def resolve_with_selection(resolver, selectable, root, info, **kwargs):
+        token = current_selection.set((selectable, selected_fields(info)))
+        try:
+            return resolver(root, info, **kwargs)
+        finally:
+            current_selection.reset(token)
+
 
 class Selectable(ObjectType):
 
@@ -37,6 +73,10 @@ class Selectable(ObjectType):
                                     selectable_field_resolvers=None,
                                     connection_class = None,
                                     interface_enum=None,
+                                    projection_pushdown=False,
+                                    auto_interfaces=False,
+                                    record_materialization=False,
+                                    result_cache_ttl=None,
                                     **options):
 
         _meta = SelectableObjectOptions(cls)
@@ -51,6 +91,27 @@ class Selectable(ObjectType):
 
         _meta.selectable_field_resolvers = selectable_field_resolvers
 
+        # Only select the columns for the fields requested by the client. This is opt in,
+        # since it is only safe if none of the resolvers of this type read instance attributes
+        # for fields that were not selected.
+        _meta.projection_pushdown = projection_pushdown
+
+        # Join the interfaces that provide the fields requested by the client, rather than
+        # the ones it lists. Opt in for the same reason as projection_pushdown.
+        _meta.auto_interfaces = auto_interfaces
+
+        # Materialize query results as lightweight tuple backed records rather than instances of this class.
+        # Records resolve like instances: unselected fields are None and methods of this class are bound
+        # to the record. Opt in, since records are not instances of this class, so resolvers must not rely on
+        # isinstance checks or on zero argument super() calls.
+        _meta.record_materialization = record_materialization
+        if record_materialization:
+            cls.is_type_of = classmethod(record_is_type_of)
+
+        # Serve the results of connection queries for this type from the result cache for
+        # this many seconds. Callers that write to the underlying data invalidate via result_cache.invalidate_results.
+        _meta.result_cache_ttl = result_cache_ttl
+
         if interface_enum is None:
             interface_enum = graphene.Enum(
             f'{cls.__name__}Interfaces', [
@@ -60,6 +121,10 @@ class Selectable(ObjectType):
         )
         _meta.interface_enum = interface_enum
 
+        # precompute field metadata for the interfaces so that the join builders
+        # do not need to introspect them per request.
+        for interface in interfaces or ():
+            register_interface(interface)
 
         if connection_class:
             _meta.connection_class = connection_class
@@ -69,7 +134,7 @@ class Selectable(ObjectType):
 
     @classmethod
     def Field(cls, key_is_required=True, **kwargs):
-        return graphene.Field(
+        return SelectableField(
             cls,
             key=graphene.Argument(type=graphene.String, required=key_is_required),
             interfaces=graphene.Argument(
@@ -119,12 +184,53 @@ class Selectable(ObjectType):
 
     @classmethod
     def get_node(cls, info, id):
-        return cls.resolve_instance(id)
+        return cls.load_instance(info, id)
+
+    @classmethod
+    def load_instance(cls, info, key, **kwargs):
+        # Batches instance resolution across the request when the named node resolver
+        # supports it and returns a promise for the instance. Otherwise resolves the instance directly.
+        kwargs = cls.apply_selection(**kwargs)
+        loader = get_instance_loader(cls, info, **kwargs)
+        if loader is not None:
+            return loader.load(key)
+
+        return cls.resolve_instance(key, **kwargs)
+
+    @classmethod
+    def keys_to_instance_resolver_params(cls, keys):
+        return dict(keys=list(keys))
 
+    @classmethod
+    def current_selected_fields(cls):
+        selection = current_selection.get()
+        if selection is not None:
+            selectable, fields = selection
+            if selectable is cls:
+                return fields
+
+    @classmethod
+    def apply_selection(cls, **kwargs):
+        # Returns the kwargs for resolving an instance adjusted for the current selection,
+        # if this type pushes the selection down.
+        fields = cls.current_selected_fields()
+        if fields is None or 'fields' in kwargs:
+            return kwargs
+
+        if cls._meta.auto_interfaces:
+            kwargs = dict(
+                kwargs,
+                interfaces=select_interfaces(cls._meta.named_node_resolver, cls._meta.interface_resolvers, fields,
+                                             **kwargs)
+            )
+        if cls._meta.projection_pushdown:
+            kwargs = dict(kwargs, fields=fields)
 
+        return kwargs
 
     @classmethod
     def resolve_instance(cls, key, **kwargs):
+        kwargs = cls.apply_selection(**kwargs)
         return resolve_instance(
             cls._meta.named_node_resolver,
             cls._meta.interface_resolvers,
@@ -183,5 +289,9 @@ class SimpleSelectableResolverMixin:
 
     @staticmethod
     def resolve_selectable(resolver, params, **kwargs):
-        with db.create_session() as session:
+        with create_session() as session:
             return session.connection.execute(resolver.selectable(**kwargs), params).fetchall()
+
+    @staticmethod
+    async def resolve_selectable_async(resolver, params, **kwargs):
+        return await run_in_thread(SimpleSelectableResolverMixin.resolve_selectable, resolver, params, **kwargs)
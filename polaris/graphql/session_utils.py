@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+
+# Copyright: © Exathink, LLC (2011-2018) All Rights Reserved
+
+# Unauthorized use or copying of this file and its contents, via any medium
+# is strictly prohibited. The work product in this file is proprietary and
+# confidential.
+
+# Author: Krishna Kumar
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from threading import get_ident
+
+from polaris.common import db
+
+# The session pinned by the innermost active request_session block, along with the thread that owns it.
+pinned_session = ContextVar('polaris_request_session', default=None)
+
+
+@contextmanager
+def request_session():
+    """
+    Unit of work for a GraphQL request: pins a single db session (and so a single connection) for
+    the duration of the block, which every create_session call made within it joins.
+
+    Applications should wrap schema execution in this block so that all the queries for a request
+    share one session. Connection resolution enters it too, so without an enclosing block, the
+    queries of a single connection field share a session. Nested blocks join the enclosing one.
+    """
+    pinned = pinned_session.get()
+    if pinned is not None and pinned[1] == get_ident():
+        yield pinned[0]
+        return
+
+    with db.create_session() as session:
+        token = pinned_session.set((session, get_ident()))
+        try:
+            yield session
+        finally:
+            pinned_session.reset(token)
+
+
+def current_session():
+    # Connections are not safe to share across threads, so work that
+    # is offloaded to a worker thread does not join the pinned session
+    pinned = pinned_session.get()
+    if pinned is not None and pinned[1] == get_ident():
+        return pinned[0]
+
+
+def create_session(join_session=None):
+    """
+    Drop in replacement for db.create_session that joins the session pinned by
+    the enclosing request_session block, if any, when no join_session is given.
+    """
+    return db.create_session(join_session or current_session())
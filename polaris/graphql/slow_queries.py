@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+
+# Copyright: © Exathink, LLC (2011-2018) All Rights Reserved
+
+# Unauthorized use or copying of this file and its contents, via any medium
+# is strictly prohibited. The work product in this file is proprietary and
+# confidential.
+
+# Author: Krishna Kumar
+
+import logging
+import random
+
+from sqlalchemy import bindparam
+from sqlalchemy.sql.elements import BindParameter, ClauseList, Grouping
+from sqlalchemy.sql.visitors import replacement_traverse
+
+from polaris.common import db
+from .temp_tables import uses_temp_table
+
+logger = logging.getLogger('polaris.graphql.slow_queries')
+
+
+def explain(connection, statement, params=None, analyze=False, format='TEXT'):
+    """
+    The rows of the plan of statement from EXPLAIN, or from EXPLAIN ANALYZE, which executes the
+    statement, if analyze is set. Only supported on PostgreSQL: returns None for other dialects.
+    """
+    if connection.dialect.name != 'postgresql':
+        return None
+    statement, params = expand_binds(statement, params)
+    compiled = statement.compile(dialect=connection.dialect)
+    options = f'ANALYZE, FORMAT {format}' if analyze else f'FORMAT {format}'
+    return connection.execute(f'EXPLAIN ({options}) {compiled}', compiled.construct_params(params)).fetchall()
+
+
+def expand_binds(statement, params=None):
+    """
+    The statement with each expanding bind parameter (such as keys, _node_ids and parent_keys) replaced
+    by a bind parameter per value, along with the parameters that remain. Expanding parameters are
+    only rendered when a statement is executed directly, so EXPLAIN cannot be given them as they are.
+    """
+    params = params or {}
+    expanded = set()
+
+    def replace(element):
+        if isinstance(element, BindParameter) and element.expanding:
+            expanded.add(element.key)
+            values = params.get(element.key, element.value) or [None]
+            return Grouping(ClauseList(*[
+                bindparam(element.key, value, type_=element.type, unique=True) for value in values
+            ]))
+
+    statement = replacement_traverse(statement, {}, replace)
+    return statement, {name: value for name, value in params.items() if name not in expanded}
+
+
+def parameter_shape(params):
+    # The names and types of the parameters without their values, which may be sensitive.
+    shape = dict()
+    for name, value in (params or {}).items():
+        if isinstance(value, (list, tuple, set)):
+            shape[name] = f'{type(value).__name__}[{len(value)}]'
+        else:
+            shape[name] = type(value).__name__
+    return shape
+
+
+class SlowQueryLog:
+    """
+    Logs instrumented statements that take longer than threshold seconds, with their SQL, the
+    shape of their parameters, the interfaces joined and the resolver context they were run for.
+    When explain is set the plan of the statement is logged too, from EXPLAIN ANALYZE for a fraction
+    analyze_sample of the slow statements, and from EXPLAIN for the rest. EXPLAIN ANALYZE executes
+    the statement again. Plans are only captured on PostgreSQL, and not for statements over temp tables.
+    """
+
+    def __init__(self, threshold=1.0, explain=True, analyze_sample=0.0, level=logging.WARNING):
+        self.threshold = threshold
+        self.explain = explain
+        self.analyze_sample = analyze_sample
+        self.level = level
+
+    def check(self, event):
+        if event.statement is not None and event.duration >= self.threshold:
+            try:
+                self.log(event)
+            except Exception as exc:
+                # capturing a slow query never fails the request
+                logger.warning(f'Slow query capture failed: {exc}')
+
+    def log(self, event):
+        message = [
+            f'Slow query: {event.resolver_context} {event.operation}{f" {event.name}" if event.name else ""} '
+            f'took {event.duration * 1000:.2f}ms',
+            f'Interfaces: {", ".join(event.interfaces or []) or "none"}',
+            f'Parameters: {parameter_shape(event.params)}',
+            f'SQL: {event.statement.compile(dialect=event.dialect)}'
+        ]
+        # The temp tables a statement uses are local to the session it ran on, so its plan cannot be captured.
+        if self.explain and not uses_temp_table(event.statement):
+            analyze = random.random() < self.analyze_sample
+            plan = self.capture_plan(event.statement, event.params, analyze)
+            if plan is not None:
+                message.append(f'{"EXPLAIN ANALYZE" if analyze else "EXPLAIN"}:\n{plan}')
+        logger.log(self.level, '\n'.join(message))
+
+    def capture_plan(self, statement, params, analyze=False):
+        # The session the statement ran on may already be gone, so the plan is captured on a session of its own.
+        with db.create_session() as session:
+            rows = explain(session.connection, statement, params, analyze)
+        return '\n'.join(row[0] for row in rows) if rows is not None else None
+
+
+# The active slow query log. None (the default) disables it.
+slow_query_log = None
+
+
+def set_slow_query_log(log):
+    global slow_query_log
+    slow_query_log = log
+
+
+def get_slow_query_log():
+    return slow_query_log
@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+
+# Copyright: © Exathink, LLC (2011-2018) All Rights Reserved
+
+# Unauthorized use or copying of this file and its contents, via any medium
+# is strictly prohibited. The work product in this file is proprietary and
+# confidential.
+
+# Author: Krishna Kumar
+
+import random
+from threading import Lock
+
+DB = 'db'
+SERVER = 'server'
+
+# The shared overheads of each path are recorded under these names alongside the summarizers:
+# loading the connection query into a temp table for db summarization, and fetching
+# the result set for server summarization.
+TEMP_TABLE = '_temp_table'
+RESULT_SET = '_result_set'
+
+
+class LatencyFit:
+    """
+    Online least squares fit of latency (seconds) against result size (rows). Samples are
+    exponentially decayed so that the fit tracks changes in data distribution and load.
+    """
+
+    def __init__(self, decay=0.95, samples=0, sw=0.0, sx=0.0, sy=0.0, sxx=0.0, sxy=0.0):
+        self.decay = decay
+        self.samples = samples
+        self.sw = sw
+        self.sx = sx
+        self.sy = sy
+        self.sxx = sxx
+        self.sxy = sxy
+
+    def record(self, rows, seconds):
+        self.sw = self.sw * self.decay + 1
+        self.sx = self.sx * self.decay + rows
+        self.sy = self.sy * self.decay + seconds
+        self.sxx = self.sxx * self.decay + rows * rows
+        self.sxy = self.sxy * self.decay + rows * seconds
+        self.samples += 1
+
+    def coefficients(self):
+        denominator = self.sw * self.sxx - self.sx * self.sx
+        if abs(denominator) < 1e-9:
+            # every sample was for the same size: the best predictor is the mean
+            return self.sy / self.sw, 0.0
+        slope = max((self.sw * self.sxy - self.sx * self.sy) / denominator, 0.0)
+        return (self.sy - slope * self.sx) / self.sw, slope
+
+    def predict(self, rows):
+        intercept, slope = self.coefficients()
+        return max(intercept + slope * rows, 0.0)
+
+    def to_dict(self):
+        intercept, slope = self.coefficients() if self.samples > 0 else (None, None)
+        return dict(
+            samples=self.samples, sw=self.sw, sx=self.sx, sy=self.sy, sxx=self.sxx, sxy=self.sxy,
+            intercept=intercept, slope=slope
+        )
+
+
+class SummarizationCostModel:
+    """
+    Learns the latency of each summarizer on each summarization path as a function of the
+    size of the connection, and predicts which path is cheaper for a given size.
+    Predictions are only made once min_samples have been recorded for every latency involved.
+    """
+
+    def __init__(self, min_samples=3, decay=0.95, exploration=0.0):
+        self.min_samples = min_samples
+        self.decay = decay
+        # The fraction of decisions made without a prediction that summarize in the db although
+        # the default heuristic would not, so that the db path is also sampled for smaller connections.
+        # Off by default. Large connections are never explored on the server path, which loads the
+        # whole result set.
+        self.exploration = exploration
+        self.fits = dict()
+        self.lock = Lock()
+
+    def record(self, name, path, rows, seconds):
+        with self.lock:
+            fit = self.fits.get((name, path))
+            if fit is None:
+                fit = self.fits[(name, path)] = LatencyFit(self.decay)
+            fit.record(rows, seconds)
+
+    def predict(self, name, path, rows):
+        with self.lock:
+            fit = self.fits.get((name, path))
+            if fit is not None and fit.samples >= self.min_samples:
+                return fit.predict(rows)
+
+    def choose_db_summaries(self, db_summaries, server_summaries, rows, result_set_needed):
+        """
+        The subset of db_summaries that are predicted to be cheaper to compute in the db, for a connection
+        of the given size. db_summaries can be summarized on either path if they are also in server_summaries.
+        Returns None if there are not enough samples to predict, in which case the caller falls back to its
+        default heuristic.
+        """
+        temp_table = self.predict(TEMP_TABLE, DB, rows)
+        result_set = 0.0 if result_set_needed else self.predict(RESULT_SET, SERVER, rows)
+        if temp_table is None or result_set is None:
+            return None
+
+        db_costs = dict()
+        server_costs = dict()
+        for name in db_summaries:
+            db_costs[name] = self.predict(name, DB, rows)
+            if db_costs[name] is None:
+                return None
+            if name in server_summaries:
+                server_costs[name] = self.predict(name, SERVER, rows)
+                if server_costs[name] is None:
+                    return None
+
+        # summaries that can only be computed in the db always are, and those that
+        # are cheaper in the db at the margin are candidates to join them.
+        chosen = {
+            name for name in db_summaries
+            if name not in server_costs or db_costs[name] < server_costs[name]
+        }
+        if len(chosen) == 0:
+            return chosen
+
+        # the temp table is only worth loading if the chosen summaries save more than it costs.
+        # The result set is only saved if no summary is left on the server side.
+        optional = [name for name in chosen if name in server_costs]
+        db_cost = temp_table + sum(db_costs[name] for name in optional)
+        server_cost = sum(server_costs[name] for name in optional)
+        if len(chosen) == len(optional) and not any(name not in chosen for name in server_summaries):
+            server_cost += result_set
+        if len(chosen) == len(optional) and db_cost >= server_cost:
+            return set()
+        return chosen
+
+    def explore(self):
+        return random.random() < self.exploration
+
+    def stats(self):
+        with self.lock:
+            return {
+                f'{name}:{path}': fit.to_dict() for (name, path), fit in self.fits.items()
+            }
+
+    def seed(self, stats):
+        """
+        Seed the model with statistics in the form returned by stats(), for instance
+        those captured from another process, so that it can predict before it has samples of its own.
+        """
+        with self.lock:
+            for key, fit in stats.items():
+                name, path = key.rsplit(':', 1)
+                self.fits[(name, path)] = LatencyFit(
+                    self.decay, fit['samples'], fit['sw'], fit['sx'], fit['sy'], fit['sxx'], fit['sxy']
+                )
+
+    def reset(self):
+        with self.lock:
+            self.fits.clear()
+
+
+summarization_costs = SummarizationCostModel()
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+
+# Copyright: © Exathink, LLC (2011-2018) All Rights Reserved
+
+# Unauthorized use or copying of this file and its contents, via any medium
+# is strictly prohibited. The work product in this file is proprietary and
+# confidential.
+
+# Author: Krishna Kumar
+
+from sqlalchemy import Index, text
+from sqlalchemy.sql.util import find_tables
+
+from polaris.common import db
+
+# Key of the temp tables registered on a pooled connection in its info dictionary,
+# which lives as long as the underlying DBAPI connection.
+TEMP_TABLES_INFO_KEY = 'polaris_temp_tables'
+
+INDEX_COLUMNS = ('id', 'key')
+
+# Key of the marker in the info dictionary of the tables created by prepare_temp_table.
+TEMP_TABLE_MARKER = 'polaris_temp_table'
+
+
+def table_signature(columns):
+    return tuple((column.name, str(column.type)) for column in columns)
+
+
+def prepare_temp_table(connection, name, columns, reuse=False, indexes=False):
+    """
+    Return an empty temp table with the given columns on connection.
+
+    When reuse is set, the table is registered on the pooled connection and later requests
+    on the same connection truncate it rather than recreate it, so the table definition is only
+    created once per connection. Reused tables are created ON COMMIT DELETE ROWS, others ON COMMIT DROP
+    where the dialect supports it. When indexes is set, the id and key columns of the table are indexed.
+    """
+    registry = connection.info.setdefault(TEMP_TABLES_INFO_KEY, dict())
+    signature = (table_signature(columns), indexes)
+    registered = registry.get(name)
+    if registered is not None:
+        registered_signature, table = registered
+        # the table is gone if the transaction that created it was rolled back.
+        if reuse and registered_signature == signature and connection.dialect.has_table(connection, name):
+            truncate_temp_table(connection, table)
+            return table
+        release_temp_table(connection, table, reuse=False)
+        registry.pop(name)
+
+    table = db.create_temp_table(name, columns)
+    table.info[TEMP_TABLE_MARKER] = True
+    if connection.dialect.name == 'postgresql':
+        table.dialect_kwargs['postgresql_on_commit'] = 'DELETE ROWS' if reuse else 'DROP'
+
+    if indexes:
+        for column in INDEX_COLUMNS:
+            if column in table.c:
+                Index(f'{name}_{column}_idx', table.c[column])
+
+    table.create(connection)
+    if reuse:
+        registry[name] = (signature, table)
+    return table
+
+
+def truncate_temp_table(connection, table):
+    if connection.dialect.name == 'postgresql':
+        connection.execute(text(f'TRUNCATE {table.name}'))
+    else:
+        connection.execute(table.delete())
+
+
+def analyze_temp_table(connection, table):
+    # Temp tables are not seen by autovacuum, so without this the planner has no
+    # statistics for the summaries computed over them.
+    connection.execute(text(f'ANALYZE {table.name}'))
+
+
+def release_temp_table(connection, table, reuse=False):
+    # Reused tables are kept for the next request on the connection. Others are dropped here
+    # rather than left for the end of the transaction, since the session may be pinned for the
+    # rest of the request and the same table created again within it.
+    if not reuse:
+        table.drop(connection, checkfirst=True)
+
+
+def uses_temp_table(statement):
+    # Whether statement reads or writes a table created by prepare_temp_table.
+    return any(table.info.get(TEMP_TABLE_MARKER) for table in find_tables(statement, include_crud=True))
@@ -7,11 +7,15 @@
 # confidential.
 
 # Author: Krishna Kumar
+import asyncio
 import inspect
 from collections import namedtuple
 import re
 import graphene
 from graphene.types.base import BaseType as GraphqlType
+from graphene.utils.str_converters import to_camel_case
+from graphql.language import ast
+from graphql.type.definition import get_named_type
 from sqlalchemy import case
 
 
@@ -27,16 +31,48 @@ def create_tuple(clazz):
     return namedtuple(clazz.__name__, properties(clazz))
 
 
-def properties(clazz):
-    return [
-        attr[0] for attr in inspect.getmembers(
-            clazz,
-            lambda a: isinstance(a, GraphqlType) or isinstance(a, graphene.Field) or isinstance(a, graphene.types.structures.Structure)
+class InterfaceFields:
+    """
+    Field metadata for an interface (or any class declaring graphene fields) computed once
+    via introspection: the ordered list of field names and the subset of them that are required.
+    Since field names are used directly as column names in the join builders,
+    field_set doubles as the set of columns an interface's selector may provide.
+    """
+
+    def __init__(self, clazz):
+        self.interface = clazz
+        self.fields = tuple(
+            attr[0] for attr in inspect.getmembers(
+                clazz,
+                lambda a: isinstance(a, GraphqlType) or isinstance(a, graphene.Field) or isinstance(a, graphene.types.structures.Structure)
+            )
         )
-    ]
+        self.field_set = frozenset(self.fields)
+        self.required = frozenset(field for field in self.fields if get_required_flag(field, clazz))
 
 
-def is_required(field, interface):
+interface_field_registry = dict()
+
+
+def register_interface(clazz):
+    metadata = interface_field_registry.get(clazz)
+    if metadata is None:
+        metadata = InterfaceFields(clazz)
+        interface_field_registry[clazz] = metadata
+    return metadata
+
+
+def interface_fields(clazz):
+    # Interfaces are registered when the Selectables that implement them are created,
+    # anything else is registered the first time it is looked up.
+    return interface_field_registry.get(clazz) or register_interface(clazz)
+
+
+def properties(clazz):
+    return list(interface_fields(clazz).fields)
+
+
+def get_required_flag(field, interface):
     attribute = getattr(interface, field, None)
     if attribute:
         kwargs = getattr(attribute, 'kwargs', None)
@@ -46,10 +82,106 @@ def is_required(field, interface):
         raise GraphQLImplementationError(f"The attribute {field} was not found on interface {interface} ")
 
 
+def is_required(field, interface):
+    metadata = interface_fields(interface)
+    if field in metadata.field_set:
+        return field in metadata.required
+    else:
+        return get_required_flag(field, interface)
+
+
 def is_paging(args):
     return 'first' in args or 'before' in args or 'after' in args or 'last' in args
 
 
+def freeze(value):
+    """
+    Convert a (possibly nested) structure of resolver kwargs into a hashable value
+    suitable for use as part of a cache key. Raises TypeError if some leaf value is not hashable.
+    """
+    if isinstance(value, dict):
+        return tuple(sorted((key, freeze(item)) for key, item in value.items()))
+    elif isinstance(value, (list, tuple)):
+        return tuple(freeze(item) for item in value)
+    elif isinstance(value, (set, frozenset)):
+        return frozenset(freeze(item) for item in value)
+    else:
+        hash(value)
+        return value
+
+
+def run_in_thread(fn, *args, **kwargs):
+    """
+    Run a blocking call on the default executor of the running event loop and return an
+    awaitable for its result. The caller's context variables are propagated to the worker thread.
+    """
+    return asyncio.to_thread(fn, *args, **kwargs)
+
+
+def selection_fields(selection_set, fragments):
+    # flatten fragment spreads and inline fragments into the list of fields they select.
+    fields = []
+    if selection_set is not None:
+        for selection in selection_set.selections:
+            if isinstance(selection, ast.Field):
+                fields.append(selection)
+            elif isinstance(selection, ast.FragmentSpread):
+                fields.extend(selection_fields(fragments[selection.name.value].selection_set, fragments))
+            elif isinstance(selection, ast.InlineFragment):
+                fields.extend(selection_fields(selection.selection_set, fragments))
+    return fields
+
+
+def selected_fields(info, path=()):
+    """
+    The set of attribute names of the fields selected on the type at the given path below the field being resolved.
+    For a connection field the nodes are at the path ('edges', 'node'). Introspection fields are ignored.
+    """
+    fields = [
+        field
+        for field_ast in info.field_asts
+        for field in selection_fields(field_ast.selection_set, info.fragments)
+    ]
+    field_type = get_named_type(info.return_type)
+    for name in path:
+        fields = [
+            field
+            for parent in fields if parent.name.value == name
+            for field in selection_fields(parent.selection_set, info.fragments)
+        ]
+        type_field = getattr(field_type, 'fields', {}).get(name)
+        field_type = get_named_type(type_field.type) if type_field is not None else None
+
+    names = field_attribute_names(
+        getattr(field_type, 'graphene_type', None), getattr(info.schema, 'auto_camelcase', True)
+    )
+    return frozenset(
+        names.get(field.name.value) or snake_case(field.name.value)
+        for field in fields if not field.name.value.startswith('__')
+    )
+
+
+# The maps from GraphQL field names to attribute names per (graphene type, auto_camelcase).
+field_attribute_name_maps = dict()
+
+
+def field_attribute_names(graphene_type, auto_camelcase=True):
+    # GraphQL names are the explicit name of a field if it has one, and otherwise its attribute name,
+    # camel cased if the schema is. Fields of types that are not graphene types map to their snake cased names.
+    meta = getattr(graphene_type, '_meta', None)
+    if getattr(meta, 'fields', None) is None:
+        return {}
+
+    key = (graphene_type, auto_camelcase)
+    names = field_attribute_name_maps.get(key)
+    if names is None:
+        names = field_attribute_name_maps[key] = {
+            getattr(field, 'name', None) or (to_camel_case(attribute) if auto_camelcase else attribute): attribute
+            for attribute, field in meta.fields.items()
+        }
+    return names
+
+
 def snake_case(name):
     s1 = re.sub('(.)([A-Z][a-z]+)', r'\1_\2', name)
     return re.sub('([a-z0-9])([A-Z])', r'\1_\2', s1).lower()
@@ -34,5 +34,9 @@ setup(
         'pytest',
         'graphene',
         'sqlalchemy'
-    ]
+    ],
+    # Columnar (vectorized) summarization of result sets.
+    extras_require={
+        'columnar': ['numpy']
+    }
 )
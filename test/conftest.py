@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+
+# Copyright: © Exathink, LLC (2011-2018) All Rights Reserved
+
+# Unauthorized use or copying of this file and its contents, via any medium
+# is strictly prohibited. The work product in this file is proprietary and
+# confidential.
+
+# Author: Krishna Kumar
+
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import types
+from contextlib import contextmanager
+from time import perf_counter
+
+import pytest
+from sqlalchemy import create_engine, Column, MetaData, Table
+from sqlalchemy.orm import sessionmaker
+
+# polaris.common is not a dependency of this package, so the parts of polaris.common.db that polaris.graphql
+# uses are stubbed here over a SQLite database. The database is a file, so that the connections used by
+# worker threads are independent of each other, as they are with a real pool.
+test_db_path = os.path.join(tempfile.mkdtemp(prefix='polaris-graphql-test-'), 'test.db')
+engine = create_engine(f'sqlite:///{test_db_path}', connect_args={'check_same_thread': False})
+Session = sessionmaker(bind=engine)
+
+
+class DbSession:
+    def __init__(self, connection):
+        self.connection = connection
+
+    def execute(self, *args, **kwargs):
+        return self.connection.execute(*args, **kwargs)
+
+
+@contextmanager
+def create_session(join_session=None):
+    if join_session is not None:
+        yield join_session
+        return
+
+    connection = engine.connect()
+    transaction = connection.begin()
+    try:
+        yield DbSession(connection)
+        transaction.commit()
+    except Exception:
+        transaction.rollback()
+        raise
+    finally:
+        connection.close()
+
+
+@contextmanager
+def orm_session(join_session=None):
+    if join_session is not None:
+        yield join_session
+        return
+
+    session = Session()
+    try:
+        yield session
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+
+def create_temp_table(name, columns):
+    return Table(name, MetaData(), *[Column(column.name, column.type) for column in columns], prefixes=['TEMPORARY'])
+
+
+db = types.ModuleType('polaris.common.db')
+db.engine = engine
+db.create_session = create_session
+db.orm_session = orm_session
+db.create_temp_table = create_temp_table
+common = types.ModuleType('polaris.common')
+common.db = db
+sys.modules['polaris.common'] = common
+sys.modules['polaris.common.db'] = db
+
+
+# Benchmarks
+
+def pytest_addoption(parser):
+    group = parser.getgroup('polaris benchmarks')
+    group.addoption('--benchmark-large', action='store_true', default=False,
+                    help='Also run the benchmarks over large (100k and 1M row) data sets')
+    group.addoption('--benchmark-rounds', type=int, default=5,
+                    help='Rounds per benchmark')
+    group.addoption('--benchmark-storage', default='.benchmarks',
+                    help='Directory that benchmark results are saved to, one file per commit')
+    group.addoption('--benchmark-compare', default=None,
+                    help='Commit (or saved results file) to compare the benchmark results with')
+
+
+def pytest_configure(config):
+    config.addinivalue_line('markers', 'large: benchmark over a large data set, run with --benchmark-large')
+    config.benchmark_results = dict()
+
+
+def pytest_collection_modifyitems(config, items):
+    if not config.getoption('--benchmark-large'):
+        skip = pytest.mark.skip(reason='large benchmark: run with --benchmark-large')
+        for item in items:
+            if 'large' in item.keywords:
+                item.add_marker(skip)
+
+
+class Benchmark:
+    """
+    Times fn over a number of rounds and records the statistics for the test under its node id.
+    extra_info is saved along with them.
+    """
+
+    def __init__(self, name, rounds, results):
+        self.name = name
+        self.rounds = rounds
+        self.results = results
+        self.extra_info = dict()
+        self.stats = None
+
+    def __call__(self, fn, *args, **kwargs):
+        timings = []
+        result = None
+        for _ in range(self.rounds):
+            start = perf_counter()
+            result = fn(*args, **kwargs)
+            timings.append(perf_counter() - start)
+
+        self.stats = dict(
+            rounds=len(timings),
+            min=min(timings),
+            max=max(timings),
+            mean=statistics.mean(timings),
+            median=statistics.median(timings)
+        )
+        self.results[self.name] = dict(self.stats, extra_info=self.extra_info)
+        return result
+
+
+@pytest.fixture
+def benchmark(request):
+    return Benchmark(request.node.nodeid, request.config.getoption('--benchmark-rounds'),
+                     request.config.benchmark_results)
+
+
+def current_commit():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.DEVNULL
+        ).decode('utf-8').strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def results_path(storage, commit):
+    return commit if commit.endswith('.json') else os.path.join(storage, f'{commit}.json')
+
+
+def pytest_sessionfinish(session):
+    results = session.config.benchmark_results
+    if len(results) == 0:
+        return
+
+    storage = session.config.getoption('--benchmark-storage')
+    os.makedirs(storage, exist_ok=True)
+    with open(results_path(storage, current_commit()), 'w') as file:
+        json.dump(results, file, indent=2, sort_keys=True)
+
+    compare = session.config.getoption('--benchmark-compare')
+    if compare is not None:
+        with open(results_path(storage, compare)) as file:
+            baseline = json.load(file)
+        session.config.benchmark_comparison = [
+            (name, baseline[name]['median'], stats['median'])
+            for name, stats in sorted(results.items()) if name in baseline
+        ]
+
+
+def pytest_terminal_summary(terminalreporter, config):
+    results = getattr(config, 'benchmark_results', {})
+    if len(results) == 0:
+        return
+
+    terminalreporter.section('benchmarks (median ms)')
+    for name, stats in sorted(results.items()):
+        terminalreporter.write_line(f'{stats["median"] * 1000:10.3f}  {name}  {stats["extra_info"] or ""}')
+
+    comparison = getattr(config, 'benchmark_comparison', None)
+    if comparison:
+        terminalreporter.section(f'benchmarks compared with {config.getoption("--benchmark-compare")}')
+        for name, before, after in comparison:
+            terminalreporter.write_line(f'{after / before:8.2f}x  {before * 1000:10.3f} -> {after * 1000:10.3f}  {name}')
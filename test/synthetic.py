@@ -0,0 +1,396 @@
+# -*- coding: utf-8 -*-
+
+# Copyright: © Exathink, LLC (2011-2018) All Rights Reserved
+
+# Unauthorized use or copying of this file and its contents, via any medium
+# is strictly prohibited. The work product in this file is proprietary and
+# confidential.
+
+# Author: Krishna Kumar
+
+"""
+A synthetic schema for tests and benchmarks: a named node table and INTERFACE_COUNT interface
+tables holding one row per node, with the Selectable, resolvers and summarizer defined over them.
+"""
+
+import graphene
+from sqlalchemy import Table, Column, Integer, String, MetaData, select, func, bindparam, event
+
+from polaris.common import db
+from polaris.graphql.base_classes import NamedNodeResolver, ConnectionResolver, InterfaceResolver
+from polaris.graphql.connection_utils import CountableConnection, ConnectionSummarizer
+from polaris.graphql.interfaces import NamedNode
+from polaris.graphql.mixins import NamedNodeResolverMixin
+from polaris.graphql.result_cache import invalidate_results
+from polaris.graphql.selectable import Selectable
+
+INTERFACE_COUNT = 4
+
+metadata = MetaData()
+
+nodes = Table(
+    'synthetic_node', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('key', String, index=True),
+    Column('name', String),
+)
+
+interface_tables = [
+    Table(
+        f'synthetic_interface_{i}', metadata,
+        Column('node_id', Integer, index=True),
+        Column(f'value_{i}', Integer),
+        Column(f'label_{i}', String),
+    )
+    for i in range(INTERFACE_COUNT)
+]
+
+interfaces = [
+    type(f'SyntheticInterface{i}', (graphene.Interface,), {
+        f'value_{i}': graphene.Int(),
+        # an explicit GraphQL name, to check that selections are mapped back to attribute names.
+        f'label_{i}': graphene.String(name=f'nodeLabel{i}'),
+    })
+    for i in range(INTERFACE_COUNT)
+]
+
+interface_names = [interface.__name__ for interface in interfaces]
+
+
+class SyntheticNodeResolver(NamedNodeResolver):
+    cache_query_plan = True
+    interface = NamedNode
+
+    @staticmethod
+    def named_node_selector(**kwargs):
+        return select([nodes.c.id, nodes.c.key, nodes.c.name]).where(nodes.c.key == bindparam('key'))
+
+    @staticmethod
+    def batch_named_node_selector(**kwargs):
+        return select([nodes.c.id, nodes.c.key, nodes.c.name]).where(
+            nodes.c.key.in_(bindparam('keys', expanding=True))
+        )
+
+
+class AllSyntheticNodes(ConnectionResolver):
+    cache_query_plan = True
+    interface = NamedNode
+
+    @staticmethod
+    def connection_nodes_selector(**kwargs):
+        return select([nodes.c.id, nodes.c.key, nodes.c.name])
+
+    @staticmethod
+    def sort_order(all_synthetic_nodes, **kwargs):
+        return [all_synthetic_nodes.c.id]
+
+
+class SyntheticNodesByBucket(ConnectionResolver):
+    # Sorted on a column with ties, in descending order.
+    cache_query_plan = True
+    interface = NamedNode
+
+    @staticmethod
+    def connection_nodes_selector(**kwargs):
+        return select([nodes.c.id, nodes.c.key, nodes.c.name, (nodes.c.id % 10).label('bucket')])
+
+    @staticmethod
+    def sort_order(synthetic_nodes_by_bucket, **kwargs):
+        return [synthetic_nodes_by_bucket.c.bucket.desc()]
+
+
+# The nodes of each bucket, nested under the buckets. Nodes are in bucket id % BUCKET_COUNT, and
+# the last bucket is empty.
+BUCKET_COUNT = 8
+
+
+class SyntheticBucketNodes(ConnectionResolver):
+    cache_query_plan = True
+    interface = NamedNode
+
+    @staticmethod
+    def connection_nodes_selector(**kwargs):
+        return select([nodes.c.id, nodes.c.key, nodes.c.name]).where(
+            nodes.c.id % (BUCKET_COUNT - 1) == bindparam('key')
+        )
+
+    @staticmethod
+    def batch_connection_nodes_selector(**kwargs):
+        return select([
+            nodes.c.id, nodes.c.key, nodes.c.name, (nodes.c.id % (BUCKET_COUNT - 1)).label('parent_key')
+        ]).where(
+            (nodes.c.id % (BUCKET_COUNT - 1)).in_(bindparam('parent_keys', expanding=True))
+        )
+
+    @staticmethod
+    def sort_order(synthetic_bucket_nodes, **kwargs):
+        return [synthetic_bucket_nodes.c.id]
+
+
+def interface_resolver(i):
+    table = interface_tables[i]
+
+    def interface_selector(named_node_cte, **kwargs):
+        return select([
+            named_node_cte.c.id,
+            table.c[f'value_{i}'],
+            table.c[f'label_{i}']
+        ]).select_from(
+            named_node_cte.join(table, table.c.node_id == named_node_cte.c.id)
+        )
+
+    return type(f'SyntheticInterface{i}Resolver', (InterfaceResolver,), dict(
+        cache_query_plan=True,
+        interface=interfaces[i],
+        interface_selector=staticmethod(interface_selector)
+    ))
+
+
+interface_resolvers = {interface_names[i]: interface_resolver(i) for i in range(INTERFACE_COUNT)}
+
+
+class SyntheticSummary(graphene.ObjectType):
+    total = graphene.Int()
+
+
+class SyntheticSummarizer(ConnectionSummarizer):
+    class Meta:
+        interface = SyntheticSummary
+
+    @staticmethod
+    def summarize_db(connection_query_temp, session):
+        return SyntheticSummary(
+            total=session.connection.execute(select([func.sum(connection_query_temp.c.value_0)])).scalar()
+        )
+
+    @staticmethod
+    def summarize_result_set(rows):
+        return SyntheticSummary(total=sum(row['value_0'] or 0 for row in rows))
+
+
+class SyntheticNodeCount(graphene.ObjectType):
+    nodes = graphene.Int()
+
+
+class SyntheticNodeCounter(ConnectionSummarizer):
+    # An incremental summary: cached, and brought up to date with the nodes added since.
+    class Meta:
+        interface = SyntheticNodeCount
+        cache_ttl = 60
+        watermark = 'key'
+
+    @staticmethod
+    def summarize_db(connection_query_temp, session):
+        return SyntheticNodeCount(
+            nodes=session.connection.execute(select([func.count()]).select_from(connection_query_temp)).scalar()
+        )
+
+    @staticmethod
+    def summarize_result_set(rows):
+        return SyntheticNodeCount(nodes=len(rows))
+
+    @staticmethod
+    def merge_result_set(summary, rows):
+        return SyntheticNodeCount(nodes=summary.nodes + len(rows))
+
+
+class SyntheticValueRange(graphene.ObjectType):
+    low = graphene.Int()
+    high = graphene.Int()
+
+
+class SyntheticValueRanger(ConnectionSummarizer):
+    # Aggregate summaries are computed together in a single scan of the temp table.
+    class Meta:
+        interface = SyntheticValueRange
+
+    @staticmethod
+    def summary_aggregates(connection_query_temp):
+        return dict(low=func.min(connection_query_temp.c.value_0), high=func.max(connection_query_temp.c.value_0))
+
+    @staticmethod
+    def summarize_aggregates(values):
+        return SyntheticValueRange(**values)
+
+    @staticmethod
+    def summarize_result_set(rows):
+        values = [row['value_0'] for row in rows if row['value_0'] is not None]
+        return SyntheticValueRange(low=min(values, default=None), high=max(values, default=None))
+
+
+class SyntheticLabelCount(graphene.ObjectType):
+    labels = graphene.Int()
+
+
+class SyntheticLabelCounter(ConnectionSummarizer):
+    class Meta:
+        interface = SyntheticLabelCount
+
+    @staticmethod
+    def summary_aggregates(connection_query_temp):
+        return dict(labels=func.count(connection_query_temp.c.label_1.distinct()))
+
+    @staticmethod
+    def summarize_aggregates(values):
+        return SyntheticLabelCount(**values)
+
+    @staticmethod
+    def summarize_result_set(rows):
+        return SyntheticLabelCount(labels=len({row['label_1'] for row in rows if row['label_1'] is not None}))
+
+
+class SyntheticNode(NamedNodeResolverMixin, Selectable):
+    class Meta:
+        interfaces = (NamedNode, *interfaces)
+        named_node_resolver = SyntheticNodeResolver
+        interface_resolvers = interface_resolvers
+        connection_class = lambda: SyntheticNodes
+
+
+class SyntheticNodeRecord(Selectable):
+    # SyntheticNode materialized as records, to compare the two.
+    class Meta:
+        interfaces = (NamedNode, *interfaces)
+        named_node_resolver = SyntheticNodeResolver
+        interface_resolvers = interface_resolvers
+        record_materialization = True
+
+
+class SyntheticProjectedNode(Selectable):
+    # SyntheticNode with the projection and the interfaces inferred from the selection.
+    class Meta:
+        interfaces = (NamedNode, *interfaces)
+        named_node_resolver = SyntheticNodeResolver
+        interface_resolvers = interface_resolvers
+        connection_class = lambda: SyntheticProjectedNodes
+        projection_pushdown = True
+        auto_interfaces = True
+
+
+class SyntheticNodes(CountableConnection):
+    class Meta:
+        node = SyntheticNode
+        summaries = (SyntheticSummary, SyntheticNodeCount, SyntheticValueRange, SyntheticLabelCount)
+
+
+class SyntheticProjectedNodes(CountableConnection):
+    class Meta:
+        node = SyntheticProjectedNode
+        summaries = (SyntheticSummary,)
+
+
+class SyntheticBucket(graphene.ObjectType):
+    bucket = graphene.Int()
+    synthetic_nodes = SyntheticNode.ConnectionField()
+
+    def resolve_synthetic_nodes(self, info, **kwargs):
+        return SyntheticNode.resolve_connection(
+            'synthetic_bucket_nodes', SyntheticBucketNodes, {}, parent_key=self.bucket, **kwargs
+        )
+
+
+class Query(graphene.ObjectType):
+    synthetic_node = SyntheticNode.Field()
+    synthetic_nodes = SyntheticNode.ConnectionField()
+    synthetic_nodes_async = SyntheticNode.ConnectionField(async_resolution=True)
+    synthetic_projected_nodes = SyntheticProjectedNode.ConnectionField()
+    synthetic_nodes_by_bucket = SyntheticNode.ConnectionField()
+    synthetic_buckets = graphene.List(SyntheticBucket)
+
+    def resolve_synthetic_node(self, info, key, **kwargs):
+        return SyntheticNode.resolve_instance(key, **kwargs)
+
+    def resolve_synthetic_nodes(self, info, **kwargs):
+        return SyntheticNode.resolve_connection('synthetic_nodes', AllSyntheticNodes, {}, **kwargs)
+
+    def resolve_synthetic_nodes_async(self, info, **kwargs):
+        return SyntheticNode.resolve_connection('synthetic_nodes', AllSyntheticNodes, {}, **kwargs)
+
+    def resolve_synthetic_projected_nodes(self, info, **kwargs):
+        return SyntheticProjectedNode.resolve_connection('synthetic_nodes', AllSyntheticNodes, {}, **kwargs)
+
+    def resolve_synthetic_nodes_by_bucket(self, info, **kwargs):
+        return SyntheticNode.resolve_connection('synthetic_nodes_by_bucket', SyntheticNodesByBucket, {}, **kwargs)
+
+    def resolve_synthetic_buckets(self, info, **kwargs):
+        return [SyntheticBucket(bucket=bucket) for bucket in range(BUCKET_COUNT)]
+
+
+schema = graphene.Schema(query=Query)
+
+
+def execute(query, **kwargs):
+    result = schema.execute(query, **kwargs)
+    if result.errors:
+        raise result.errors[0]
+    return result.data
+
+
+def executed_sql(query, dialect=None, **kwargs):
+    # The SQL statements executed for query, along with its result. Given a dialect, the statements
+    # are the executed clauses compiled for it rather than the SQL sent to the test database.
+    statements = []
+    if dialect is None:
+        event_name = 'before_cursor_execute'
+        listener = lambda connection, cursor, statement, *args: statements.append(statement)
+    else:
+        event_name = 'before_execute'
+        listener = lambda connection, clause, *args: statements.append(str(clause.compile(dialect=dialect)))
+    event.listen(db.engine, event_name, listener)
+    try:
+        data = execute(query, **kwargs)
+    finally:
+        event.remove(db.engine, event_name, listener)
+    return statements, data
+
+
+def connection_query(**kwargs):
+    return SyntheticNode.resolve_connection('synthetic_nodes', AllSyntheticNodes, {}, **kwargs)
+
+
+def node_key(i):
+    return f'key-{i:08d}'
+
+
+populated_rows = None
+
+
+def populate(rows):
+    """
+    Load the tables with the given number of nodes. The tables are only reloaded when the size changes.
+    """
+    global populated_rows
+    if populated_rows == rows:
+        return
+
+    metadata.create_all(db.engine)
+    with db.engine.begin() as connection:
+        for table in [*interface_tables, nodes]:
+            connection.execute(table.delete())
+        connection.execute(nodes.insert(), [
+            dict(id=i, key=node_key(i), name=f'node {i}') for i in range(1, rows + 1)
+        ])
+        for n, table in enumerate(interface_tables):
+            connection.execute(table.insert(), [
+                {'node_id': i, f'value_{n}': i % 97, f'label_{n}': f'label {i % 13}'} for i in range(1, rows + 1)
+            ])
+    invalidate_results(resolver_context='synthetic_nodes')
+    populated_rows = rows
+
+
+def delete_nodes(ids):
+    with db.engine.begin() as connection:
+        for table in interface_tables:
+            connection.execute(table.delete().where(table.c.node_id.in_(ids)))
+        connection.execute(nodes.delete().where(nodes.c.id.in_(ids)))
+    global populated_rows
+    populated_rows = None
+
+
+def add_nodes(start, count):
+    with db.engine.begin() as connection:
+        connection.execute(nodes.insert(), [
+            dict(id=i, key=node_key(i), name=f'node {i}') for i in range(start, start + count)
+        ])
+    global populated_rows
+    populated_rows = None
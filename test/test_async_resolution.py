@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+
+# Copyright: © Exathink, LLC (2011-2018) All Rights Reserved
+
+# Unauthorized use or copying of this file and its contents, via any medium
+# is strictly prohibited. The work product in this file is proprietary and
+# confidential.
+
+# Author: Krishna Kumar
+
+import asyncio
+
+import pytest
+from graphql.execution.executors.asyncio import AsyncioExecutor
+
+from polaris.graphql.connection_utils import QueryConnectionField
+
+from synthetic import schema, populate, execute, interface_names
+
+INTERFACES = ', '.join(interface_names)
+
+# The page arguments of connections that are resolved by concurrent_page_connection,
+# and those that fall back to resolving on a worker thread.
+CONCURRENT_PAGES = ['first: 10', 'first: 10, after: "YXJyYXljb25uZWN0aW9uOjk="', 'first: 200']
+THREADED = ['last: 10', 'summaries: [SyntheticSummary]']
+
+
+def execute_async(query):
+    loop = asyncio.new_event_loop()
+    try:
+        result = schema.execute(query, executor=AsyncioExecutor(loop=loop))
+    finally:
+        loop.close()
+    assert result.errors is None, result.errors
+    return result.data
+
+
+def connection_query(field, args):
+    return f'{{ {field}({args}, interfaces: [{INTERFACES}]) {{ count ' \
+           f'pageInfo {{ hasNextPage hasPreviousPage startCursor endCursor }} ' \
+           f'edges {{ cursor node {{ key value0 nodeLabel3 }} }} }} }}'
+
+
+@pytest.mark.parametrize('args', CONCURRENT_PAGES + THREADED)
+def test_async_resolution_matches_sync(args):
+    populate(100)
+    expected = execute(connection_query('syntheticNodes', args))['syntheticNodes']
+    assert execute_async(connection_query('syntheticNodesAsync', args))['syntheticNodesAsync'] == expected
+
+
+def test_concurrent_pages_are_fetched_concurrently(monkeypatch):
+    populate(100)
+    calls = []
+    concurrent_page_connection = QueryConnectionField.concurrent_page_connection.__func__
+
+    async def spy(cls, *args):
+        calls.append(args)
+        return await concurrent_page_connection(cls, *args)
+
+    monkeypatch.setattr(QueryConnectionField, 'concurrent_page_connection', classmethod(spy))
+    execute_async(f'{{ a: syntheticNodesAsync(first: 5) {{ count }} b: syntheticNodesAsync(first: 7) {{ count }} }}')
+    assert len(calls) == 2
@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+
+# Copyright: © Exathink, LLC (2011-2018) All Rights Reserved
+
+# Unauthorized use or copying of this file and its contents, via any medium
+# is strictly prohibited. The work product in this file is proprietary and
+# confidential.
+
+# Author: Krishna Kumar
+
+import pytest
+from graphql_relay.connection.arrayconnection import offset_to_cursor
+
+from synthetic import populate, executed_sql, interface_names, BUCKET_COUNT
+
+
+def bucket_query(args):
+    return f'{{ syntheticBuckets {{ bucket syntheticNodes({args}, interfaces: [{interface_names[0]}]) {{ count ' \
+           f'pageInfo {{ hasNextPage hasPreviousPage startCursor endCursor }} ' \
+           f'edges {{ cursor node {{ key value0 }} }} }} }} }}'
+
+
+@pytest.mark.parametrize('args', [
+    'first: 3',
+    f'first: 3, after: "{offset_to_cursor(1)}"',
+    # past the end of some of the buckets
+    f'first: 5, after: "{offset_to_cursor(12)}"',
+])
+def test_batched_connections_match_unbatched(args):
+    populate(100)
+    # the connections of sibling parents are only batched within a request context.
+    batched, batched_data = executed_sql(bucket_query(args), context_value={})
+    unbatched, unbatched_data = executed_sql(bucket_query(args))
+
+    assert batched_data == unbatched_data
+    assert len(batched) == 1
+    # a count per bucket, and a page per non empty bucket
+    assert len(unbatched) == 2 * BUCKET_COUNT - 1
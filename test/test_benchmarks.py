@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+
+# Copyright: © Exathink, LLC (2011-2018) All Rights Reserved
+
+# Unauthorized use or copying of this file and its contents, via any medium
+# is strictly prohibited. The work product in this file is proprietary and
+# confidential.
+
+# Author: Krishna Kumar
+
+import tracemalloc
+
+import pytest
+
+from polaris.common import db
+from polaris.graphql.join_utils import build_cte_join, collect_join_resolvers
+from polaris.graphql.records import to_objects
+
+from synthetic import SyntheticNode, SyntheticNodeRecord, AllSyntheticNodes, interface_resolvers, interface_names, \
+    populate, execute, connection_query
+
+ROW_COUNTS = [100, 1000, 10000, pytest.param(100000, marks=pytest.mark.large)]
+
+
+def build_plan():
+    return build_cte_join(
+        AllSyntheticNodes,
+        collect_join_resolvers(interface_resolvers, interfaces=interface_names),
+        'synthetic_nodes',
+        interfaces=interface_names
+    )
+
+
+def test_cte_join_build(benchmark):
+    benchmark.extra_info['interfaces'] = len(interface_names)
+    plan = benchmark(build_plan)
+    assert all(f'value_{i}' in plan.column_names for i in range(len(interface_names)))
+
+
+def test_sql_compile(benchmark):
+    query = build_plan().query
+    compiled = benchmark(lambda: str(query.compile(dialect=db.engine.dialect)))
+    assert all(f'value_{i}' in compiled for i in range(len(interface_names)))
+
+
+@pytest.mark.parametrize('rows', ROW_COUNTS)
+def test_execute(benchmark, rows):
+    populate(rows)
+    benchmark.extra_info['rows'] = rows
+    result = benchmark(lambda: connection_query(interfaces=interface_names).execute(to_object=False))
+    assert len(result) == rows
+
+
+@pytest.mark.parametrize('rows', ROW_COUNTS)
+def test_to_object(benchmark, rows):
+    populate(rows)
+    benchmark.extra_info['rows'] = rows
+    result_set = connection_query(interfaces=interface_names).execute(to_object=False)
+    instances = benchmark(to_objects, SyntheticNode, result_set)
+    assert len(instances) == rows
+
+
+@pytest.mark.parametrize('paged', [True, False])
+def test_connection_resolver(benchmark, paged):
+    populate(10000)
+    benchmark.extra_info['paged'] = paged
+    data = benchmark(
+        execute,
+        f'{{ syntheticNodes({"first: 50, " if paged else ""}interfaces: [{", ".join(interface_names)}]) '
+        f'{{ count edges {{ node {{ key value0 value1 }} }} }} }}'
+    )
+    assert data['syntheticNodes']['count'] == 10000
+    assert len(data['syntheticNodes']['edges']) == (50 if paged else 10000)
+
+
+@pytest.mark.parametrize('rows', [1000, 10000, pytest.param(100000, marks=pytest.mark.large)])
+@pytest.mark.parametrize('summarize', ['db', 'server'])
+def test_summarization(benchmark, summarize, rows):
+    populate(rows)
+    benchmark.extra_info.update(rows=rows, summarize=summarize)
+    data = benchmark(
+        execute,
+        f'{{ syntheticNodes(summariesOnly: true, summaries: [SyntheticSummary], summarize: {summarize}, '
+        f'interfaces: [{interface_names[0]}]) {{ count syntheticSummary {{ total }} }} }}'
+    )
+    assert data['syntheticNodes']['count'] == rows
+    assert data['syntheticNodes']['syntheticSummary']['total'] == sum(i % 97 for i in range(1, rows + 1))
+
+
+def page_of_objects(split, page_size):
+    query = connection_query(interfaces=interface_names)
+    query.set_options(split_interfaces=split)
+    query.slice(0, page_size)
+    return query.execute()
+
+
+@pytest.mark.parametrize('page_size', [50, 1000])
+@pytest.mark.parametrize('mode', ['single', 'split'])
+def test_split_interfaces(benchmark, mode, page_size):
+    populate(10000)
+    benchmark.extra_info.update(mode=mode, page_size=page_size)
+    instances = benchmark(page_of_objects, mode == 'split', page_size)
+    fields = ['key', *(f'value_{i}' for i in range(len(interface_names)))]
+    assert [[getattr(instance, field) for field in fields] for instance in instances] == \
+           [[getattr(instance, field) for field in fields] for instance in page_of_objects(False, page_size)]
+    assert len(instances) == page_size
+
+
+def retained_bytes(fn, *args):
+    # The memory still allocated by what fn returns, once it has returned.
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        result = fn(*args)
+        return tracemalloc.get_traced_memory()[0] - before, result
+    finally:
+        tracemalloc.stop()
+
+
+@pytest.mark.parametrize('rows', [1000, 10000, pytest.param(100000, marks=pytest.mark.large)])
+@pytest.mark.parametrize('materialization', ['object', 'record'])
+def test_materialization(benchmark, materialization, rows):
+    populate(rows)
+    output_type = SyntheticNodeRecord if materialization == 'record' else SyntheticNode
+    result_set = connection_query(interfaces=interface_names).execute(to_object=False)
+
+    instances = benchmark(to_objects, output_type, result_set)
+    memory, _ = retained_bytes(to_objects, output_type, result_set)
+    benchmark.extra_info.update(
+        materialization=materialization,
+        rows=rows,
+        us_per_node=round(benchmark.stats['median'] / rows * 1e6, 3),
+        bytes_per_node=round(memory / rows)
+    )
+    assert [instance.value_0 for instance in instances] == [row['value_0'] for row in result_set]
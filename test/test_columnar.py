@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+
+# Copyright: © Exathink, LLC (2011-2018) All Rights Reserved
+
+# Unauthorized use or copying of this file and its contents, via any medium
+# is strictly prohibited. The work product in this file is proprietary and
+# confidential.
+
+# Author: Krishna Kumar
+
+import pytest
+
+numpy = pytest.importorskip('numpy')
+
+from polaris.graphql.columnar import ResultColumns
+from polaris.graphql.result_cache import cached_row_class
+
+ROW_COUNTS = [1000, 100000, pytest.param(1000000, marks=pytest.mark.large)]
+
+row_class = cached_row_class(('key', 'value', 'tags'))
+
+
+def result_set(rows):
+    return [row_class((f'key-{i}', i % 97 if i % 10 else None, [i] * (i % 3))) for i in range(rows)]
+
+
+def summarize_rows(rows):
+    values = [row['value'] for row in rows if row['value'] is not None]
+    return sum(values), len(values)
+
+
+def summarize_columns(rows):
+    values = ResultColumns(rows)['value']
+    return int(numpy.nansum(values)), int(numpy.count_nonzero(~numpy.isnan(values)))
+
+
+@pytest.mark.parametrize('rows', ROW_COUNTS)
+@pytest.mark.parametrize('summarize', ['rows', 'columns'])
+def test_summarization(benchmark, summarize, rows):
+    data = result_set(rows)
+    benchmark.extra_info.update(summarize=summarize, rows=rows)
+    summary = benchmark(summarize_columns if summarize == 'columns' else summarize_rows, data)
+    assert summary == summarize_rows(data)
+
+
+def test_ragged_list_columns():
+    columns = ResultColumns(result_set(10))
+    assert columns['tags'].shape == (10,)
+    assert [list(tags) for tags in columns['tags']] == [[i] * (i % 3) for i in range(10)]
+
+
+def test_list_columns_of_equal_length():
+    columns = ResultColumns([row_class(('a', 1, [1, 2])), row_class(('b', 2, [3, 4]))])
+    assert columns['tags'].shape == (2,)
+    assert list(columns['tags'][1]) == [3, 4]
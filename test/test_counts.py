@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+
+# Copyright: © Exathink, LLC (2011-2018) All Rights Reserved
+
+# Unauthorized use or copying of this file and its contents, via any medium
+# is strictly prohibited. The work product in this file is proprietary and
+# confidential.
+
+# Author: Krishna Kumar
+
+import pytest
+from graphql.error import GraphQLError
+
+from synthetic import populate, execute
+
+
+def counted(args):
+    connection = execute(f'{{ syntheticNodes({args}) {{ count countMode edges {{ node {{ key }} }} }} }}')['syntheticNodes']
+    return connection['count'], connection['countMode']
+
+
+@pytest.mark.parametrize('args, expected', [
+    ('first: 5', (100, 'exact')),
+    ('first: 5, countMode: exact', (100, 'exact')),
+    # there is no planner estimate on the test database, so the count is exact.
+    ('first: 5, countMode: estimated', (100, 'exact')),
+    ('first: 5, countMode: capped, countCap: 20', (20, 'capped')),
+    # the cap is raised to cover the page
+    ('first: 30, countMode: capped, countCap: 20', (30, 'capped')),
+    # capped counts of fewer rows than the cap are exact
+    ('first: 5, countMode: capped, countCap: 200', (100, 'exact')),
+    ('first: 5, countMode: capped, countCap: 1', (5, 'capped')),
+])
+def test_count_modes(args, expected):
+    populate(100)
+    assert counted(args) == expected
+
+
+@pytest.mark.parametrize('count_cap', [0, -1])
+def test_count_caps_below_one_are_rejected(count_cap):
+    populate(100)
+    with pytest.raises(GraphQLError, match='countCap'):
+        counted(f'first: 5, countMode: capped, countCap: {count_cap}')
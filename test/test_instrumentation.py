@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+
+# Copyright: © Exathink, LLC (2011-2018) All Rights Reserved
+
+# Unauthorized use or copying of this file and its contents, via any medium
+# is strictly prohibited. The work product in this file is proprietary and
+# confidential.
+
+# Author: Krishna Kumar
+
+from sqlalchemy import select, func
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+
+from polaris.graphql import instrumentation
+from polaris.graphql.instrumentation import execute_instrumented, instrument, request_instrumentation
+
+from synthetic import schema, nodes, populate, interface_names
+
+
+def test_statements_are_fingerprinted():
+    populate(100)
+    result = execute_instrumented(
+        schema, f'{{ syntheticNodes(first: 10, interfaces: [{interface_names[0]}]) {{ count }} }}'
+    )
+    assert result.errors is None
+    events = result.extensions['instrumentation']['events']
+    assert any(event['operation'] == 'count' and event['fingerprint'] for event in events)
+
+
+def test_fingerprints_use_the_execution_dialect():
+    statement = select([func.array_agg(aggregate_order_by(nodes.c.key, nodes.c.id))])
+    with request_instrumentation() as collected:
+        with instrument(instrumentation.EXECUTE, 'synthetic_nodes', statement=statement) as event:
+            event.dialect = postgresql.dialect()
+    assert collected.events[0].fingerprint is not None
+
+
+def test_fingerprint_failures_do_not_fail_the_request():
+    # aggregate_order_by cannot be compiled for the default dialect.
+    statement = select([func.array_agg(aggregate_order_by(nodes.c.key, nodes.c.id))])
+    with request_instrumentation() as collected:
+        with instrument(instrumentation.EXECUTE, 'synthetic_nodes', statement=statement):
+            pass
+    assert collected.events[0].fingerprint is None
@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+
+# Copyright: © Exathink, LLC (2011-2018) All Rights Reserved
+
+# Unauthorized use or copying of this file and its contents, via any medium
+# is strictly prohibited. The work product in this file is proprietary and
+# confidential.
+
+# Author: Krishna Kumar
+
+import pytest
+from sqlalchemy.dialects import postgresql
+from graphql_relay.connection.arrayconnection import offset_to_cursor
+
+from polaris.graphql.connection_utils import ConnectionResolverQuery
+
+from synthetic import populate, executed_sql, interface_names
+
+
+def page_query(args):
+    return f'{{ syntheticNodes({args}, interfaces: [{", ".join(interface_names)}]) {{ count ' \
+           f'edges {{ cursor node {{ key value0 nodeLabel3 }} }} }} }}'
+
+
+@pytest.mark.parametrize('args', [
+    'first: 10',
+    f'first: 10, after: "{offset_to_cursor(44)}"',
+    # a partial last page
+    f'first: 10, after: "{offset_to_cursor(95)}"',
+])
+def test_late_materialization_joins_interfaces_to_the_page_of_nodes(monkeypatch, args):
+    populate(100)
+    expected = executed_sql(page_query(args))[1]
+
+    monkeypatch.setattr(ConnectionResolverQuery, 'LATE_MATERIALIZATION', True)
+    statements, data = executed_sql(page_query(args), postgresql.dialect())
+    assert data == expected
+    assert any('LIMIT %(_nodes_limit)s OFFSET %(_nodes_offset)s' in statement for statement in statements)
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+
+# Copyright: © Exathink, LLC (2011-2018) All Rights Reserved
+
+# Unauthorized use or copying of this file and its contents, via any medium
+# is strictly prohibited. The work product in this file is proprietary and
+# confidential.
+
+# Author: Krishna Kumar
+
+import pytest
+
+from polaris.graphql.connection_utils import ConnectionResolverQuery, keyset_cursor
+
+from synthetic import populate, execute, node_key
+
+# The order of syntheticNodesByBucket: id % 10 descending, ties broken by id.
+BUCKET_ORDER = [node_key(i) for i in sorted(range(1, 101), key=lambda i: (-(i % 10), i))]
+
+
+def page(args, field='syntheticNodes'):
+    return execute(
+        f'{{ {field}({args}) {{ pageInfo {{ hasNextPage hasPreviousPage startCursor endCursor }} '
+        f'edges {{ cursor node {{ key }} }} }} }}'
+    )[field]
+
+
+def keys(connection):
+    return [edge['node']['key'] for edge in connection['edges']]
+
+
+def page_forward(first, after=None, field='syntheticNodes'):
+    paged = []
+    for _ in range(100):
+        connection = page(f'first: {first}' + (f', after: "{after}"' if after else ''), field)
+        paged.extend(keys(connection))
+        if not connection['pageInfo']['hasNextPage']:
+            return paged
+        after = connection['pageInfo']['endCursor']
+    raise AssertionError('paging forward did not reach the end of the connection')
+
+
+def page_backward(last, field='syntheticNodes'):
+    paged = []
+    before = None
+    for _ in range(100):
+        connection = page(f'last: {last}' + (f', before: "{before}"' if before else ''), field)
+        paged[:0] = keys(connection)
+        if not connection['pageInfo']['hasPreviousPage']:
+            return paged
+        before = connection['pageInfo']['startCursor']
+    raise AssertionError('paging backward did not reach the start of the connection')
+
+
+@pytest.fixture
+def keyset_paging(monkeypatch):
+    populate(100)
+    monkeypatch.setattr(ConnectionResolverQuery, 'KEYSET_PAGING', True)
+
+
+def test_keyset_paging_with_window_count_pages_through_the_connection(monkeypatch):
+    populate(100)
+    monkeypatch.setattr(ConnectionResolverQuery, 'KEYSET_PAGING', True)
+    monkeypatch.setattr(ConnectionResolverQuery, 'WINDOW_COUNT', True)
+    assert page_forward(30) == [node_key(i) for i in range(1, 101)]
+    # from a keyset cursor issued by an earlier request
+    assert page_forward(30, after=keyset_cursor([10])) == [node_key(i) for i in range(11, 101)]
+
+
+def test_keyset_paging_forward(keyset_paging):
+    # pages of 7 end within runs of tied buckets
+    assert page_forward(7, field='syntheticNodesByBucket') == BUCKET_ORDER
+
+
+def test_keyset_paging_backward(keyset_paging):
+    assert page_backward(7, field='syntheticNodesByBucket') == BUCKET_ORDER
+
+
+def test_keyset_paging_last_page(keyset_paging):
+    connection = page('last: 5', 'syntheticNodesByBucket')
+    assert keys(connection) == BUCKET_ORDER[-5:]
+    assert connection['pageInfo']['hasPreviousPage'] and not connection['pageInfo']['hasNextPage']
+
+
+def test_keyset_paging_from_a_cursor_at_a_tie(keyset_paging):
+    # node 29 is the third of the ten nodes in bucket 9.
+    after = keyset_cursor([9, 29])
+    assert keys(page(f'first: 4, after: "{after}"', 'syntheticNodesByBucket')) == BUCKET_ORDER[3:7]
+    assert keys(page(f'last: 2, before: "{after}"', 'syntheticNodesByBucket')) == BUCKET_ORDER[0:2]
+
+
+def test_keyset_pages_are_bounded_by_both_cursors(keyset_paging):
+    after, before = keyset_cursor([9, 9]), keyset_cursor([9, 69])
+    # nodes 19..59 of bucket 9 are between the cursors
+    assert keys(page(f'first: 3, before: "{before}"', 'syntheticNodesByBucket')) == BUCKET_ORDER[:3]
+    assert keys(page(f'last: 3, after: "{after}"', 'syntheticNodesByBucket')) == BUCKET_ORDER[-3:]
+    assert keys(page(f'first: 10, after: "{after}", before: "{before}"', 'syntheticNodesByBucket')) == \
+        BUCKET_ORDER[1:6]
+    assert keys(page(f'last: 10, after: "{after}", before: "{before}"', 'syntheticNodesByBucket')) == \
+        BUCKET_ORDER[1:6]
@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+
+# Copyright: © Exathink, LLC (2011-2018) All Rights Reserved
+
+# Unauthorized use or copying of this file and its contents, via any medium
+# is strictly prohibited. The work product in this file is proprietary and
+# confidential.
+
+# Author: Krishna Kumar
+
+import pytest
+
+from polaris.graphql.join_utils import resolve_local_join
+
+from synthetic import SyntheticNode, SyntheticNodeRecord
+
+
+@pytest.mark.parametrize('output_type', [SyntheticNode, SyntheticNodeRecord])
+def test_local_joins_of_ragged_result_sets(output_type):
+    # Node 2 has no row in the second result set.
+    named_nodes = [dict(id=1, key='a', name='one'), dict(id=2, key='b', name='two')]
+    values = [dict(id=1, value_0=10)]
+
+    instances = {instance.key: instance for instance in resolve_local_join([named_nodes, values], 'id', output_type)}
+    assert (instances['a'].name, instances['a'].value_0) == ('one', 10)
+    assert (instances['b'].name, instances['b'].value_0) == ('two', None)
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+
+# Copyright: © Exathink, LLC (2011-2018) All Rights Reserved
+
+# Unauthorized use or copying of this file and its contents, via any medium
+# is strictly prohibited. The work product in this file is proprietary and
+# confidential.
+
+# Author: Krishna Kumar
+
+from sqlalchemy import select, func
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+
+from polaris.common import db
+from polaris.graphql.result_cache import pack_rows, unpack_rows, result_cache_key, invalidate_results, \
+    compiled_statements
+
+from synthetic import nodes, populate, connection_query, node_key, delete_nodes
+
+
+def test_cached_rows_are_used_like_result_rows():
+    populate(100)
+    with db.engine.connect() as connection:
+        rows = connection.execute(select([nodes.c.id, nodes.c.key]).order_by(nodes.c.id).limit(2)).fetchall()
+
+    cached = unpack_rows(pack_rows(rows))
+    for row, cached_row in zip(rows, cached):
+        assert (cached_row.key, cached_row['key'], cached_row[1]) == (row.key, row['key'], row[1])
+        assert cached_row.keys() == row.keys()
+        assert cached_row.items() == row.items()
+        assert dict(cached_row) == dict(row)
+
+
+def test_result_cache_key_uses_the_dialect():
+    statement = select([func.array_agg(aggregate_order_by(nodes.c.key, nodes.c.id))])
+    key = result_cache_key(statement, dict(key='a'), postgresql.dialect())
+    assert key == result_cache_key(statement, dict(key='a'))
+    assert key != result_cache_key(statement, dict(key='b'))
+
+
+def test_counts_are_invalidated_with_the_entities_of_their_connection():
+    populate(100)
+    query = lambda: connection_query(first=5, result_cache_ttl=60)
+    assert query().count() == 100
+    assert node_key(3) in [row.key for row in query().execute(to_object=False)]
+
+    delete_nodes([3])
+    invalidate_results(entity_key=node_key(3))
+    assert query().count() == 99
+    assert node_key(3) not in [row.key for row in query().execute(to_object=False)]
+
+
+def test_compiled_statements_of_uncached_plans_are_not_memoized():
+    statement = select([nodes.c.key]).where(nodes.c.id == 1)
+    result_cache_key(statement, memoize=False)
+    assert statement not in compiled_statements
+    result_cache_key(statement)
+    assert statement in compiled_statements
@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+
+# Copyright: © Exathink, LLC (2011-2018) All Rights Reserved
+
+# Unauthorized use or copying of this file and its contents, via any medium
+# is strictly prohibited. The work product in this file is proprietary and
+# confidential.
+
+# Author: Krishna Kumar
+
+from synthetic import execute, populate, interface_names
+
+NODE_FIELDS = 'key value0 nodeLabel1'
+
+
+def nodes(field, args):
+    return [
+        edge['node']
+        for edge in execute(f'{{ {field}({args}) {{ edges {{ node {{ {NODE_FIELDS} }} }} }} }}')[field]['edges']
+    ]
+
+
+def test_projected_fields_are_mapped_to_attribute_names():
+    # value0 is the camel cased value_0 and nodeLabel1 the explicit name of label_1.
+    populate(20)
+    projected = nodes('syntheticProjectedNodes', 'first: 5')
+    assert all(node['value0'] is not None and node['nodeLabel1'] is not None for node in projected)
+    assert projected == nodes('syntheticNodes', f'first: 5, interfaces: [{interface_names[0]}, {interface_names[1]}]')
+
+
+def test_summaries_keep_the_interfaces_the_selection_needs():
+    populate(20)
+    result = execute(
+        '{ syntheticProjectedNodes(first: 5, summaries: [SyntheticSummary]) '
+        f'{{ syntheticSummary {{ total }} edges {{ node {{ {NODE_FIELDS} }} }} }} }}'
+    )['syntheticProjectedNodes']
+    assert [edge['node'] for edge in result['edges']] == nodes('syntheticProjectedNodes', 'first: 5')
@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+
+# Copyright: © Exathink, LLC (2011-2018) All Rights Reserved
+
+# Unauthorized use or copying of this file and its contents, via any medium
+# is strictly prohibited. The work product in this file is proprietary and
+# confidential.
+
+# Author: Krishna Kumar
+
+from sqlalchemy import event
+
+from polaris.common import db
+from polaris.graphql.session_utils import request_session
+
+from synthetic import populate, execute, node_key, interface_names
+
+
+def test_instance_and_connection_resolution_join_the_request_session():
+    populate(100)
+    checkouts = []
+    listener = lambda *args: checkouts.append(1)
+    event.listen(db.engine, 'checkout', listener)
+    try:
+        with request_session():
+            data = execute(
+                f'{{ syntheticNode(key: "{node_key(1)}", interfaces: [{interface_names[0]}]) {{ key value0 }} '
+                f'syntheticNodes(first: 5) {{ count }} }}'
+            )
+    finally:
+        event.remove(db.engine, 'checkout', listener)
+
+    assert data['syntheticNode'] == dict(key=node_key(1), value0=1)
+    assert data['syntheticNodes']['count'] == 100
+    assert len(checkouts) == 1
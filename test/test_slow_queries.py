@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+
+# Copyright: © Exathink, LLC (2011-2018) All Rights Reserved
+
+# Unauthorized use or copying of this file and its contents, via any medium
+# is strictly prohibited. The work product in this file is proprietary and
+# confidential.
+
+# Author: Krishna Kumar
+
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql
+
+from polaris.common import db
+from polaris.graphql.slow_queries import expand_binds
+from polaris.graphql.temp_tables import prepare_temp_table, release_temp_table, uses_temp_table
+from polaris.graphql.join_utils import cte_join
+
+from synthetic import SyntheticNodeResolver, interface_resolvers, interface_names, populate, node_key, nodes
+
+
+def test_expanded_binds_select_the_same_rows():
+    populate(100)
+    statement = cte_join(SyntheticNodeResolver, [interface_resolvers[interface_names[0]]], 'synthetic_instances',
+                         batch_keys=True)
+    params = dict(keys=[node_key(3), node_key(5), node_key(8)])
+    expanded, expanded_params = expand_binds(statement, params)
+
+    # EXPLAIN is given the compiled text, so it must not leave the expansion to execution.
+    compiled = expanded.compile(dialect=postgresql.dialect())
+    assert 'EXPANDING' not in str(compiled)
+    assert compiled.construct_params(expanded_params)['keys_2'] == node_key(5)
+
+    with db.engine.connect() as connection:
+        rows = connection.execute(statement, params).fetchall()
+        expanded_rows = connection.execute(expanded, expanded_params).fetchall()
+    assert [tuple(row) for row in expanded_rows] == [tuple(row) for row in rows]
+    assert len(rows) == 3
+
+
+def test_statements_over_temp_tables_are_recognized():
+    with db.engine.begin() as connection:
+        temp_table = prepare_temp_table(connection, 'synthetic_nodes_temp', nodes.c)
+        try:
+            assert uses_temp_table(select([temp_table.c.id]))
+            assert uses_temp_table(temp_table.insert().from_select(nodes.c, select(nodes.c)))
+            assert not uses_temp_table(select([nodes.c.id]))
+        finally:
+            release_temp_table(connection, temp_table)
@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+
+# Copyright: © Exathink, LLC (2011-2018) All Rights Reserved
+
+# Unauthorized use or copying of this file and its contents, via any medium
+# is strictly prohibited. The work product in this file is proprietary and
+# confidential.
+
+# Author: Krishna Kumar
+
+from sqlalchemy.dialects import postgresql
+
+from synthetic import populate, executed_sql, interface_names
+
+
+def page_query(interfaces, first=10, after=None):
+    return f'{{ syntheticNodes(first: {first}, {f"after: {chr(34)}{after}{chr(34)}, " if after else ""}' \
+           f'interfaces: [{", ".join(interfaces)}]) {{ count pageInfo {{ endCursor }} edges {{ node {{ key }} }} }} }}'
+
+
+def test_pages_compile_to_the_same_sql():
+    populate(100)
+    first_page, data = executed_sql(page_query(interface_names), postgresql.dialect())
+    second_page, second_data = executed_sql(page_query(
+        interface_names, after=data['syntheticNodes']['pageInfo']['endCursor']
+    ), postgresql.dialect())
+
+    assert second_page == first_page
+    assert second_data['syntheticNodes']['edges'] != data['syntheticNodes']['edges']
+
+
+def test_permuted_interfaces_compile_to_the_same_sql():
+    populate(100)
+    statements, data = executed_sql(page_query(interface_names))
+    permuted, permuted_data = executed_sql(page_query(list(reversed(interface_names))))
+
+    assert permuted == statements
+    assert permuted_data == data
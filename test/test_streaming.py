@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+
+# Copyright: © Exathink, LLC (2011-2018) All Rights Reserved
+
+# Unauthorized use or copying of this file and its contents, via any medium
+# is strictly prohibited. The work product in this file is proprietary and
+# confidential.
+
+# Author: Krishna Kumar
+
+from polaris.graphql.connection_utils import ConnectionResolverQuery
+
+from synthetic import populate, execute, executed_sql, interface_names
+
+QUERY = f'{{ syntheticNodes(interfaces: [{interface_names[0]}]) {{ count countMode ' \
+        f'pageInfo {{ startCursor endCursor hasNextPage hasPreviousPage }} edges {{ cursor node {{ key value0 }} }} }} }}'
+
+
+def test_streaming_connections_match_the_unstreamed_result(monkeypatch):
+    populate(100)
+    expected = execute(QUERY)
+    monkeypatch.setattr(ConnectionResolverQuery, 'STREAMING', True)
+    monkeypatch.setattr(ConnectionResolverQuery, 'STREAM_BATCH_SIZE', 7)
+    assert execute(QUERY) == expected
+
+
+def test_streaming_connections_only_count_when_selected(monkeypatch):
+    populate(100)
+    monkeypatch.setattr(ConnectionResolverQuery, 'STREAMING', True)
+    statements, data = executed_sql('{ syntheticNodes { edges { node { key } } } }')
+
+    assert len(data['syntheticNodes']['edges']) == 100
+    assert not any('count(' in statement.lower() for statement in statements)
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+
+# Copyright: © Exathink, LLC (2011-2018) All Rights Reserved
+
+# Unauthorized use or copying of this file and its contents, via any medium
+# is strictly prohibited. The work product in this file is proprietary and
+# confidential.
+
+# Author: Krishna Kumar
+
+import pytest
+
+from polaris.graphql.connection_utils import ConnectionResolverQuery
+from polaris.graphql.session_utils import request_session
+
+from synthetic import populate, add_nodes, execute, executed_sql, interface_names
+
+
+@pytest.mark.parametrize('summarize', ['db', 'server'])
+def test_incremental_summaries_merge_the_rows_added_since(summarize):
+    populate(100)
+    query = f'{{ syntheticNodes(summariesOnly: true, summaries: [SyntheticNodeCount], summarize: {summarize}) ' \
+            f'{{ syntheticNodeCount {{ nodes }} }} }}'
+
+    assert execute(query)['syntheticNodes']['syntheticNodeCount']['nodes'] == 100
+    add_nodes(101, 5)
+    assert execute(query)['syntheticNodes']['syntheticNodeCount']['nodes'] == 105
+    add_nodes(106, 1)
+    assert execute(query)['syntheticNodes']['syntheticNodeCount']['nodes'] == 106
+
+
+def test_aggregate_summaries_are_computed_in_one_scan():
+    populate(100)
+    query = lambda summarize: f'{{ syntheticNodes(summariesOnly: true, ' \
+                              f'summaries: [SyntheticValueRange, SyntheticLabelCount], summarize: {summarize}, ' \
+                              f'interfaces: [{interface_names[0]}, {interface_names[1]}]) ' \
+                              f'{{ syntheticValueRange {{ low high }} syntheticLabelCount {{ labels }} }} }}'
+
+    statements, data = executed_sql(query('db'))
+    assert data == execute(query('server'))
+    assert data['syntheticNodes'] == dict(syntheticValueRange=dict(low=0, high=96), syntheticLabelCount=dict(labels=13))
+    assert len([statement for statement in statements if 'max(' in statement and 'count(DISTINCT' in statement]) == 1
+
+
+@pytest.mark.parametrize('reuse, creates', [(False, 2), (True, 1)])
+def test_temp_tables_are_reused_within_a_request_session(monkeypatch, reuse, creates):
+    populate(100)
+    monkeypatch.setattr(ConnectionResolverQuery, 'TEMP_TABLE_REUSE', reuse)
+    query = f'{{ syntheticNodes(summariesOnly: true, summaries: [SyntheticSummary], summarize: db, ' \
+            f'interfaces: [{interface_names[0]}]) {{ syntheticSummary {{ total }} }} }}'
+
+    with request_session():
+        first, first_data = executed_sql(query)
+        second, second_data = executed_sql(query)
+
+    statements = first + second
+    assert second_data == first_data
+    assert len([statement for statement in statements if statement.startswith('\nCREATE TEMPORARY TABLE')]) == creates
+    # the reused table is emptied rather than recreated.
+    assert len([statement for statement in second if statement.startswith('DELETE FROM')]) == (1 if reuse else 0)